@@ -0,0 +1,3 @@
+import standalone
+
+standalone.registerPluginPackage()
@@ -0,0 +1,90 @@
+import os
+import random
+import string
+
+from PIL import Image, ImageDraw
+
+from octoprint_timelapseplus.cacheController import CacheController
+from octoprint_timelapseplus.helpers.formatHelper import FormatHelper
+from octoprint_timelapseplus.model.enhancementPreset import EnhancementPreset
+from octoprint_timelapseplus.model.intermediateFormat import IntermediateFormat
+from octoprint_timelapseplus.model.mask import Mask
+from octoprint_timelapseplus.model.renderPreset import RenderPreset
+from octoprint_timelapseplus.model.renderThrottleMode import RenderThrottleMode
+
+
+class BenchmarkSettings:
+    def __init__(self, host, dataFolder, overrides=None):
+        self.DATA_FOLDER = dataFolder
+
+        # The plugin's defaults of all settings the rendering pipeline reads
+        self.VALUES = dict(
+            ffmpegPath='ffmpeg',
+            ffprobePath='ffprobe',
+            enhancementPresets=[EnhancementPreset(host).getJSON()],
+            renderPresets=[RenderPreset().getJSON()],
+            defaultVideoFormat=FormatHelper.getDefaultVideoFormat().ID,
+            renderMultithreading=True,
+            renderMultiprocessing=False,
+            renderStreamFrames=True,
+            renderFfmpegFiltergraph=True,
+            renderEncodeSegments=1,
+            renderParallelInterpolation=False,
+            renderIntermediateFormat=IntermediateFormat.JPEG.name,
+            renderMaxConcurrentJobs=1,
+            renderThrottleMode=RenderThrottleMode.NONE.name
+        )
+        if overrides is not None:
+            self.VALUES.update(overrides)
+
+    def get(self, path):
+        return self.VALUES.get(path[0])
+
+    def set(self, path, value):
+        self.VALUES[path[0]] = value
+
+    def getBaseFolder(self, type):
+        folder = self.DATA_FOLDER + '/' + type
+        os.makedirs(folder, exist_ok=True)
+        return folder
+
+
+class BenchmarkHost:
+    """
+    Stands in for the plugin as the parent of Render Jobs, so they can run without an OctoPrint server
+    """
+
+    def __init__(self, baseFolder, dataFolder, settingsOverrides=None):
+        self._basefolder = baseFolder
+        self._data_folder = dataFolder
+        self._settings = BenchmarkSettings(self, dataFolder, settingsOverrides)
+        self.CACHE_CONTROLLER = CacheController(self, dataFolder, self._settings)
+
+        self.STATES = []
+
+    def getPluginVersion(self):
+        return 'benchmark'
+
+    def getRandomString(self, length):
+        return ''.join(random.choice(string.ascii_uppercase + string.digits) for i in range(length))
+
+    def renderJobStateChanged(self, job, state):
+        self.STATES.append(state)
+
+    def renderJobProgressChanged(self, job, progress):
+        pass
+
+    def sendClientPopup(self, type, title, message):
+        print('[' + type + '] ' + title + ': ' + message)
+
+    def sendClientData(self, force=False):
+        pass
+
+    def createBlurMask(self, width, height):
+        # Blurs the upper left quarter of the frame, like a mask hiding the room behind the printer
+        mask = Mask(self, self._data_folder, None)
+        img = Image.new('L', (width, height), 0)
+        ImageDraw.Draw(img).rectangle((0, 0, width // 2, height // 2), fill=255)
+        img.save(mask.PATH)
+        img.close()
+        return mask
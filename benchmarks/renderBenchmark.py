@@ -0,0 +1,223 @@
+"""
+Renders synthetic Frame Collections with a fixed set of presets and reports the throughput, CPU time, I/O and peak memory
+of every Render Stage. It runs the plugin's Render Jobs without OctoPrint, only Pillow, NumPy and a local FFmpeg are needed.
+
+    python -m benchmarks.renderBenchmark --ffmpeg /usr/bin/ffmpeg --resolution 1920x1080 --frames 300
+    python -m benchmarks.renderBenchmark --preset timecode --preset pproll --set renderIntermediateFormat=RAW
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from octoprint_timelapseplus.helpers.formatHelper import FormatHelper
+from octoprint_timelapseplus.helpers.memorySampler import MemorySampler
+from octoprint_timelapseplus.log import Log
+from octoprint_timelapseplus.model.combineMethod import CombineMethod
+from octoprint_timelapseplus.model.enhancementPreset import EnhancementPreset
+from octoprint_timelapseplus.model.frameZip import FrameZip
+from octoprint_timelapseplus.model.ppRollType import PPRollType
+from octoprint_timelapseplus.model.renderJob import RenderJob
+from octoprint_timelapseplus.model.renderPreset import RenderPreset
+from octoprint_timelapseplus.model.timecodeType import TimecodeType
+from .benchmarkHost import BenchmarkHost
+from .syntheticFrameZip import SyntheticFrameZip
+
+# Name of the result row covering the whole Render Job, including opening the Frame Collection
+PIPELINE = 'pipeline'
+
+
+class BenchmarkRenderJob(RenderJob):
+    def __init__(self, results, *args, **kwargs):
+        self.RESULTS = results
+        super().__init__(*args, **kwargs)
+
+    def finishStage(self, name, usage):
+        super().finishStage(name, usage)
+        self.RESULTS.append(dict(stage=name, frames=len(self.FRAMES), seconds=usage.WALL_TIME, cpuSeconds=usage.CPU_TIME,
+                                 bytesRead=usage.BYTES_READ, bytesWritten=usage.BYTES_WRITTEN, peakRss=usage.PEAK_RSS))
+
+
+class RenderBenchmark:
+    PRESET_NAMES = ['plain', 'resize', 'enhance', 'normalize', 'blur', 'timecode', 'combine', 'pproll', 'interpolate']
+
+    def __init__(self, args):
+        self.ARGS = args
+        self.WIDTH, self.HEIGHT = [int(x) for x in args.resolution.lower().split('x')]
+        self.BASE_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + '/octoprint_timelapseplus'
+        self.DATA_FOLDER = tempfile.mkdtemp(prefix='timelapseplus-benchmark-')
+
+        overrides = dict(ffmpegPath=args.ffmpeg)
+        for s in args.set:
+            key, value = s.split('=', 1)
+            try:
+                overrides[key] = json.loads(value)
+            except ValueError:
+                overrides[key] = value
+
+        self.HOST = BenchmarkHost(self.BASE_FOLDER, self.DATA_FOLDER, overrides)
+        self.VIDEO_FORMAT = FormatHelper.getVideoFormatById(args.format)
+
+    def createPresets(self, name):
+        ep = EnhancementPreset(self.HOST)
+        rp = RenderPreset()
+        ep.NAME = 'Benchmark ' + name
+        rp.NAME = 'Benchmark ' + name
+
+        if name == 'resize':
+            rp.RESIZE = True
+            rp.RESIZE_W = self.WIDTH // 2
+            rp.RESIZE_H = self.HEIGHT // 2
+        elif name == 'enhance':
+            ep.ENHANCE = True
+            ep.BRIGHTNESS = 1.2
+            ep.CONTRAST = 1.1
+            ep.EQUALIZE = True
+        elif name == 'normalize':
+            ep.NORMALIZE = True
+            ep.DEFLICKER = True
+        elif name == 'blur':
+            ep.BLUR = True
+            ep.BLUR_MASK = self.HOST.createBlurMask(self.WIDTH, self.HEIGHT)
+        elif name == 'timecode':
+            ep.TIMECODE = True
+            ep.TIMECODE_TYPE = TimecodeType.PRINTTIME_HMS_LETTERS
+        elif name == 'combine':
+            rp.COMBINE = True
+            rp.COMBINE_SIZE = 3
+            rp.COMBINE_METHOD = CombineMethod.MEDIAN
+        elif name == 'pproll':
+            rp.PPROLL = True
+            rp.PPROLL_PRE_TYPE = PPRollType.LAPSE
+            rp.FADE = True
+        elif name == 'interpolate':
+            rp.INTERPOLATE = True
+            rp.INTERPOLATE_FRAMERATE = rp.FRAMERATE * 2
+
+        return ep, rp
+
+    def createFrameZip(self):
+        path = self.DATA_FOLDER + '/benchmark_print.zip'
+        Log.info('Generating synthetic Frame Collection', dict(resolution=self.ARGS.resolution, frames=self.ARGS.frames))
+        SyntheticFrameZip(self.WIDTH, self.HEIGHT, self.ARGS.frames, self.ARGS.compress, not self.ARGS.no_metadata, self.ARGS.seed).write(path)
+        return FrameZip(path, self.HOST)
+
+    def runPreset(self, frameZip, name):
+        results = []
+        ep, rp = self.createPresets(name)
+        job = BenchmarkRenderJob(results, self.BASE_FOLDER, frameZip, self.HOST, self.HOST._settings, self.DATA_FOLDER, ep, rp, self.VIDEO_FORMAT)
+
+        sampler = MemorySampler()
+        sampler.start()
+        timeStart = time.monotonic()
+        job.startPipeline()
+        seconds = time.monotonic() - timeStart
+        peakRss = sampler.stop()
+
+        # Short peaks of a stage can fall between two samples of the whole pipeline
+        peakRss = max([peakRss] + [r['peakRss'] for r in results])
+        results.append(dict(stage=PIPELINE, frames=len(job.FRAMES), seconds=seconds, cpuSeconds=sum(r['cpuSeconds'] for r in results),
+                            bytesRead=sum(r['bytesRead'] for r in results), bytesWritten=sum(r['bytesWritten'] for r in results), peakRss=peakRss))
+        return results
+
+    @staticmethod
+    def summarize(preset, runs):
+        # Every repetition runs the same stages, the median usage and the largest peak memory are reported
+        rows = []
+        for i, first in enumerate(runs[0]):
+            seconds = statistics.median([run[i]['seconds'] for run in runs])
+            rows.append(dict(
+                preset=preset,
+                stage=first['stage'],
+                frames=first['frames'],
+                seconds=seconds,
+                cpuSeconds=statistics.median([run[i]['cpuSeconds'] for run in runs]),
+                framesPerSecond=first['frames'] / seconds if seconds > 0 else 0,
+                bytesRead=statistics.median([run[i]['bytesRead'] for run in runs]),
+                bytesWritten=statistics.median([run[i]['bytesWritten'] for run in runs]),
+                peakRss=max([run[i]['peakRss'] for run in runs])
+            ))
+        return rows
+
+    def getFfmpegVersion(self):
+        try:
+            output = subprocess.check_output([self.ARGS.ffmpeg, '-version'], stderr=subprocess.STDOUT)
+            return output.decode('utf-8', errors='replace').splitlines()[0]
+        except Exception:
+            return None
+
+    def getHostInfo(self):
+        return dict(
+            machine=platform.machine(),
+            platform=platform.platform(),
+            python=platform.python_version(),
+            cpus=os.cpu_count(),
+            ffmpeg=self.getFfmpegVersion()
+        )
+
+    @staticmethod
+    def printTable(rows):
+        header = ('Preset', 'Stage', 'Frames', 'Seconds', 'CPU s', 'Frames/s', 'Read MiB', 'Written MiB', 'Peak MiB')
+        lines = [header]
+        for r in rows:
+            lines.append((r['preset'], r['stage'], str(r['frames']), '{:.2f}'.format(r['seconds']), '{:.2f}'.format(r['cpuSeconds']), '{:.1f}'.format(r['framesPerSecond']),
+                          '{:.1f}'.format(r['bytesRead'] / 1024 / 1024), '{:.1f}'.format(r['bytesWritten'] / 1024 / 1024), '{:.0f}'.format(r['peakRss'] / 1024 / 1024)))
+
+        widths = [max(len(line[i]) for line in lines) for i in range(len(header))]
+        for line in lines:
+            print('  '.join(line[i].ljust(widths[i]) if i < 2 else line[i].rjust(widths[i]) for i in range(len(header))))
+
+    def run(self):
+        try:
+            frameZip = self.createFrameZip()
+            rows = []
+            for name in self.ARGS.preset or self.PRESET_NAMES:
+                Log.info('Benchmarking preset ' + name)
+                runs = [self.runPreset(frameZip, name) for i in range(self.ARGS.repeat)]
+                rows += self.summarize(name, runs)
+
+            self.printTable(rows)
+
+            if self.ARGS.json is not None:
+                with open(self.ARGS.json, 'w') as f:
+                    json.dump(dict(host=self.getHostInfo(), arguments=vars(self.ARGS), results=rows), f, indent=2)
+        finally:
+            if self.ARGS.keep:
+                print('Kept benchmark data in ' + self.DATA_FOLDER)
+            else:
+                shutil.rmtree(self.DATA_FOLDER, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Timelapse+ rendering pipeline')
+    parser.add_argument('--ffmpeg', default=shutil.which('ffmpeg') or 'ffmpeg', help='path of the FFmpeg binary')
+    parser.add_argument('--resolution', default='1280x720', help='frame size of the synthetic Frame Collection, e.g. 1920x1080')
+    parser.add_argument('--frames', type=int, default=200, help='number of frames in the synthetic Frame Collection')
+    parser.add_argument('--compress', action='store_true', help='deflate the frames in the Frame Collection')
+    parser.add_argument('--no-metadata', action='store_true', help='leave out the metadata, timecodes and pre-roll texts are skipped')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic frames')
+    parser.add_argument('--preset', action='append', choices=RenderBenchmark.PRESET_NAMES, help='preset to run, can be repeated (default: all)')
+    parser.add_argument('--format', default=FormatHelper.getDefaultVideoFormat().ID, help='ID of the video format to encode')
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE', help='override a plugin setting, values are parsed as JSON when possible')
+    parser.add_argument('--repeat', type=int, default=1, help='number of runs per preset, the median is reported')
+    parser.add_argument('--json', help='also write the results and host information to this file')
+    parser.add_argument('--keep', action='store_true', help='keep the generated Frame Collection and videos')
+    parser.add_argument('--verbose', action='store_true', help='print the plugin log')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING, format='[%(asctime)s.%(msecs)03d] %(levelname)s: %(message)s', datefmt='%H:%M:%S')
+    Log.LOGGER = logging.getLogger('benchmark')
+
+    RenderBenchmark(args).run()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
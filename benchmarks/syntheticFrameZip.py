@@ -0,0 +1,98 @@
+import io
+import json
+import math
+import random
+import zipfile
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from octoprint_timelapseplus.helpers.fileHelper import FileHelper
+
+
+class SyntheticFrameZip:
+    # Seconds between two snapshots in the generated metadata
+    SNAPSHOT_INTERVAL = 10
+
+    # Relative brightness variation between frames, so normalizing and deflickering have something to do
+    FLICKER = 0.08
+
+    def __init__(self, width, height, numFrames, compress=False, withMetadata=True, seed=0):
+        self.WIDTH = width
+        self.HEIGHT = height
+        self.NUM_FRAMES = numFrames
+        self.COMPRESS = compress
+        self.WITH_METADATA = withMetadata
+        self.SEED = seed
+
+    def createBackground(self, rnd):
+        # A static print bed with some texture, so the JPEGs compress like real webcam frames
+        img = Image.new('RGB', (self.WIDTH, self.HEIGHT), (60, 62, 70))
+        draw = ImageDraw.Draw(img)
+        for i in range(200):
+            x = rnd.randrange(self.WIDTH)
+            y = rnd.randrange(self.HEIGHT)
+            r = rnd.randrange(2, max(3, self.WIDTH // 40))
+            c = rnd.randrange(40, 120)
+            draw.ellipse((x - r, y - r, x + r, y + r), fill=(c, c, c + 10))
+
+        bedTop = int(self.HEIGHT * 0.6)
+        draw.rectangle((0, bedTop, self.WIDTH, self.HEIGHT), fill=(30, 30, 34))
+        for x in range(0, self.WIDTH, max(1, self.WIDTH // 16)):
+            draw.line((x, bedTop, x, self.HEIGHT), fill=(50, 50, 56), width=max(1, self.WIDTH // 400))
+
+        imgBlurred = img.filter(ImageFilter.GaussianBlur(max(1, self.WIDTH // 800)))
+        img.close()
+        return imgBlurred
+
+    def renderFrame(self, background, index, rnd):
+        progress = index / max(1, self.NUM_FRAMES - 1)
+        img = background.copy()
+        draw = ImageDraw.Draw(img)
+
+        # The printed part grows, the print head moves around
+        bedTop = int(self.HEIGHT * 0.6)
+        partW = int(self.WIDTH * 0.3)
+        partH = int(self.HEIGHT * 0.4 * progress)
+        partX = (self.WIDTH - partW) // 2
+        draw.rectangle((partX, bedTop - partH, partX + partW, bedTop), fill=(200, 90, 40))
+
+        headX = int(self.WIDTH / 2 + math.sin(index * 0.7) * self.WIDTH * 0.3)
+        headY = bedTop - partH - int(self.HEIGHT * 0.12)
+        headW = int(self.WIDTH * 0.12)
+        draw.rectangle((headX - headW // 2, headY - headW // 2, headX + headW // 2, headY + headW // 2), fill=(220, 220, 225))
+
+        flicker = 1 + rnd.uniform(-self.FLICKER, self.FLICKER)
+        imgFlickered = img.point(lambda v: min(255, int(v * flicker)))
+        img.close()
+        return imgFlickered
+
+    def write(self, path):
+        rnd = random.Random(self.SEED)
+        background = self.createBackground(rnd)
+
+        started = 1700000000
+        metadata = {
+            'timestamps': {},
+            'started': started,
+            'ended': started + self.NUM_FRAMES * self.SNAPSHOT_INTERVAL,
+            'success': True,
+            'baseName': 'benchmark_print',
+            'pluginVersion': 'benchmark'
+        }
+
+        compressType = zipfile.ZIP_DEFLATED if self.COMPRESS else zipfile.ZIP_STORED
+        with zipfile.ZipFile(path, 'w') as zipFile:
+            for i in range(self.NUM_FRAMES):
+                fileBaseName = "{:05d}".format(i + 1) + ".jpg"
+                img = self.renderFrame(background, i, rnd)
+                buf = io.BytesIO()
+                img.save(buf, format='JPEG', quality=90)
+                img.close()
+                zipFile.writestr(fileBaseName, buf.getvalue(), compress_type=compressType)
+                metadata['timestamps'][fileBaseName] = started + (i + 1) * self.SNAPSHOT_INTERVAL
+
+            if self.WITH_METADATA:
+                zipFile.writestr(FileHelper.METADATA_FILE_NAME, json.dumps(metadata), compress_type=zipfile.ZIP_STORED)
+
+        background.close()
+        return path
@@ -2,6 +2,7 @@ import glob
 import io
 import os
 import random
+import shutil
 import string
 import sys
 from threading import Thread
@@ -22,16 +23,19 @@ from .helpers.positionTracker import PositionTracker
 from .model.captureMode import CaptureMode
 from .model.enhancementPreset import EnhancementPreset
 from .model.frameZip import FrameZip
+from .model.intermediateFormat import IntermediateFormat
 from .model.mask import Mask
 from .model.printJob import PrintJob
 from .model.renderJob import RenderJob
 from .model.renderJobState import RenderJobState
+from .model.renderThrottleMode import RenderThrottleMode
 from .model.renderPreset import RenderPreset
 from .model.snapshotInfoFrame import SnapshotInfoFrame
 from .model.stabilizatonSettings import StabilizationSettings
 from .model.video import Video
 from .model.webcamType import WebcamType
 from .prerequisitesController import PrerequisitesController
+from .renderController import RenderController
 from .webcamController import WebcamController
 
 
@@ -104,6 +108,10 @@ class TimelapsePlusPlugin(
         self.doApiRequest(self.API_CONTROLLER.render)
         return self.API_CONTROLLER.emptyResponse()
 
+    @octoprint.plugin.BlueprintPlugin.route("/renderPreview", methods=["POST"])
+    def apiRenderPreview(self):
+        return self.doApiRequest(self.API_CONTROLLER.renderPreview)
+
     @octoprint.plugin.BlueprintPlugin.route("/thumbnail", methods=["GET"])
     def apiThumbnail(self):
         return self.doApiRequest(self.API_CONTROLLER.thumbnail)
@@ -209,7 +217,15 @@ class TimelapsePlusPlugin(
             stabilizationSettings=StabilizationSettings().getJSON(),
             snapshotInfo=True,
             snapshotInfoFrame=SnapshotInfoFrame.ZOOM_ALL.name,
-            renderMultithreading=True
+            renderMultithreading=True,
+            renderMultiprocessing=False,
+            renderStreamFrames=True,
+            renderFfmpegFiltergraph=True,
+            renderEncodeSegments=1,
+            renderParallelInterpolation=False,
+            renderIntermediateFormat=IntermediateFormat.JPEG.name,
+            renderMaxConcurrentJobs=1,
+            renderThrottleMode=RenderThrottleMode.PAUSE.name
         )
 
     def get_template_vars(self):
@@ -247,7 +263,15 @@ class TimelapsePlusPlugin(
             stabilizationSettings=stabilizationSettings,
             snapshotInfo=self._settings.get(["snapshotInfo"]),
             snapshotInfoFrame=self._settings.get(["snapshotInfoFrame"]),
-            renderMultithreading=self._settings.get(["renderMultithreading"])
+            renderMultithreading=self._settings.get(["renderMultithreading"]),
+            renderMultiprocessing=self._settings.get(["renderMultiprocessing"]),
+            renderStreamFrames=self._settings.get(["renderStreamFrames"]),
+            renderFfmpegFiltergraph=self._settings.get(["renderFfmpegFiltergraph"]),
+            renderEncodeSegments=self._settings.get(["renderEncodeSegments"]),
+            renderParallelInterpolation=self._settings.get(["renderParallelInterpolation"]),
+            renderIntermediateFormat=self._settings.get(["renderIntermediateFormat"]),
+            renderMaxConcurrentJobs=self._settings.get(["renderMaxConcurrentJobs"]),
+            renderThrottleMode=self._settings.get(["renderThrottleMode"])
         )
 
     def listFrameZips(self):
@@ -280,6 +304,15 @@ class TimelapsePlusPlugin(
         )
         self._plugin_manager.send_plugin_message(self._identifier, data)
 
+    def sendClientPreview(self, job):
+        data = dict(
+            type='preview',
+            id=job.ID,
+            title=job.BASE_NAME,
+            url='/plugin/timelapseplus/download?type=preview&id=' + job.ID
+        )
+        self._plugin_manager.send_plugin_message(self._identifier, data)
+
     def sendClientData(self, force=False):
         Thread(target=self.sendClientDataInner, args=(force,), daemon=True).start()
 
@@ -366,8 +399,10 @@ class TimelapsePlusPlugin(
         self.API_CONTROLLER = ApiController(self, self.get_plugin_data_folder(), self._basefolder, self._settings, self.CACHE_CONTROLLER, self.WEBCAM_CONTROLLER)
         self.CLEANUP_CONTROLLER = CleanupController(self, self.get_plugin_data_folder(), self._settings)
         self.CLIENT_CONTROLLER = ClientController(self, self._identifier, self._plugin_manager)
+        self.RENDER_CONTROLLER = RenderController(self, self._settings)
 
         self.CLEANUP_CONTROLLER.init()
+        self.resumeRenderJobs()
 
         epRaw = self._settings.get(["enhancementPresets"])
         epList = list(map(lambda x: EnhancementPreset(self, x), epRaw))
@@ -443,7 +478,9 @@ class TimelapsePlusPlugin(
         self.sendClientData()
 
         if state == RenderJobState.FINISHED or state == RenderJobState.FAILED:
-            if state == RenderJobState.FINISHED:
+            if state == RenderJobState.FINISHED and job.isPreview():
+                self.sendClientPreview(job)
+            elif state == RenderJobState.FINISHED:
                 self.sendClientPopup('success', 'Render Job finished', job.BASE_NAME)
 
             if state == RenderJobState.FAILED:
@@ -527,10 +564,28 @@ class TimelapsePlusPlugin(
         finally:
             return line
 
-    def render(self, frameZip, enhancementPreset=None, renderPreset=None, videoFormat=None):
-        job = RenderJob(self._basefolder, frameZip, self, self._settings, self.get_plugin_data_folder(), enhancementPreset, renderPreset, videoFormat)
-        job.start()
+    def render(self, frameZip, enhancementPreset=None, renderPreset=None, videoFormat=None, priority=0, previewFrameStep=0):
+        job = RenderJob(self._basefolder, frameZip, self, self._settings, self.get_plugin_data_folder(), enhancementPreset, renderPreset, videoFormat, previewFrameStep=previewFrameStep)
+        self.RENDER_CONTROLLER.enqueue(job, priority)
         self.RENDERJOBS.append(job)
+        return job
+
+    def resumeRenderJobs(self):
+        dataFolder = self.get_plugin_data_folder()
+        for folder in RenderJob.listResumableFolders(dataFolder):
+            try:
+                job = RenderJob.fromManifest(self._basefolder, folder, self, self._settings, dataFolder)
+            except Exception as e:
+                Log.error('Could not resume Render Job', {'folder': folder, 'error': str(e)})
+                shutil.rmtree(folder, ignore_errors=True)
+                continue
+
+            if job is None:
+                continue
+
+            Log.info('Resuming interrupted Render Job', {'id': job.ID, 'completedStages': job.COMPLETED_STAGES})
+            self.RENDER_CONTROLLER.enqueue(job)
+            self.RENDERJOBS.append(job)
 
     def printStarted(self):
         if not self._settings.get(["enabled"]):
@@ -1,4 +1,5 @@
 import base64
+import glob
 import io
 import os
 import re
@@ -24,6 +25,7 @@ from .model.webcamType import WebcamType
 from .helpers.formatHelper import FormatHelper
 from .model.enhancementPreset import EnhancementPreset
 from .model.renderPreset import RenderPreset
+from .model.renderJob import RenderJob
 from .model.mask import Mask
 
 
@@ -126,6 +128,10 @@ class ApiController:
             allFrameZips = self.PARENT.listFrameZips()
             frameZip = next(x for x in allFrameZips if x.ID == id)
             return send_file(frameZip.PATH, as_attachment=True, download_name=os.path.basename(frameZip.PATH))
+        if data['type'] == 'preview':
+            allPreviews = glob.glob(RenderJob.getPreviewFolder(self._data_folder) + '/*.mp4')
+            preview = next(x for x in allPreviews if os.path.splitext(os.path.basename(x))[0] == id)
+            return send_file(preview, mimetype='video/mp4')
 
     def enhancementPreview(self):
         import flask
@@ -181,7 +187,28 @@ class ApiController:
         renderPreset = RenderPreset(data['presetRender'])
         videoFormat = FormatHelper.getVideoFormatById(data['formatId'])
 
-        self.PARENT.render(frameZip, enhancementPreset, renderPreset, videoFormat)
+        priority = int(data.get('priority', 0))
+
+        self.PARENT.render(frameZip, enhancementPreset, renderPreset, videoFormat, priority)
+
+    def renderPreview(self):
+        import flask
+        data = flask.request.get_json()
+        frameZipId = data['frameZipId']
+        allFrameZips = self.PARENT.listFrameZips()
+        frameZip = next(x for x in allFrameZips if x.ID == frameZipId)
+
+        enhancementPreset = EnhancementPreset(self.PARENT, data['presetEnhancement'])
+        renderPreset = RenderPreset(data['presetRender'])
+        frameStep = max(1, int(data.get('frameStep', RenderJob.PREVIEW_FRAME_STEP)))
+
+        # Previews are meant to be watched right away, so they are queued before regular Render Jobs
+        priority = int(data.get('priority', 1))
+
+        job = self.PARENT.render(frameZip, enhancementPreset, renderPreset, None, priority, frameStep)
+
+        # The finished preview is announced to every client, only the one that started it opens it
+        return dict(id=job.ID)
 
     def listPresets(self):
         epRaw = self._settings.get(["enhancementPresets"])
@@ -3,7 +3,9 @@ import os
 import shutil
 import time
 
+from .helpers.fileHelper import FileHelper
 from .model.mask import Mask
+from .model.renderJob import RenderJob
 from .model.enhancementPreset import EnhancementPreset
 from octoprint.util import ResettableTimer
 
@@ -23,6 +25,7 @@ class CleanupController:
     def init(self):
         self.cleanCapture()
         self.cleanRender()
+        self.cleanPreviews(0)
         self.cleanUnusedMasks()
 
         self.CRON_TIMER = ResettableTimer(self.CRON_TIMER_INTERVAL, self.onCron)
@@ -30,6 +33,7 @@ class CleanupController:
 
     def onCron(self):
         self.cleanUnusedMasks()
+        self.cleanPreviews(self.SECONDS_1_HOUR)
 
         self.purgeFiles()
 
@@ -80,8 +84,20 @@ class CleanupController:
         if not os.path.exists(folder):
             return
 
-        shutil.rmtree(folder)
-        os.makedirs(folder, exist_ok=True)
+        # Folders with a manifest belong to interrupted Render Jobs that will be resumed
+        for f in glob.glob(folder + '/*'):
+            if os.path.isfile(f + '/' + FileHelper.RENDER_MANIFEST_FILE_NAME):
+                continue
+            if os.path.isdir(f):
+                shutil.rmtree(f)
+            else:
+                os.remove(f)
+
+    def cleanPreviews(self, seconds):
+        folder = RenderJob.getPreviewFolder(self._data_folder)
+        for f in glob.glob(folder + '/*'):
+            if self.fileIsOlderThan(f, seconds):
+                os.remove(f)
 
     def cleanWebcamTemp(self):
         folder = self._data_folder + '/webcam-tmp'
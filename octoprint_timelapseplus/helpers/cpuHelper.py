@@ -0,0 +1,63 @@
+import math
+import os
+
+
+class CpuHelper:
+    @staticmethod
+    def getAvailableCpuCount():
+        count = os.cpu_count() or 1
+
+        if hasattr(os, 'sched_getaffinity'):
+            try:
+                count = len(os.sched_getaffinity(0))
+            except OSError:
+                pass
+
+        quota = CpuHelper.getCgroupCpuQuota()
+        if quota is not None:
+            count = min(count, max(1, math.ceil(quota)))
+
+        return max(1, count)
+
+    @staticmethod
+    def getCgroupCpuQuota():
+        # cgroup v2
+        try:
+            with open('/sys/fs/cgroup/cpu.max', 'r') as f:
+                quota, period = f.read().split()[:2]
+            if quota != 'max':
+                return int(quota) / int(period)
+            return None
+        except (OSError, ValueError):
+            pass
+
+        # cgroup v1
+        try:
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us', 'r') as f:
+                quota = int(f.read())
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us', 'r') as f:
+                period = int(f.read())
+            if quota > 0 and period > 0:
+                return quota / period
+        except (OSError, ValueError):
+            pass
+
+        return None
+
+    @staticmethod
+    def setProcessNiceness(pid, niceness):
+        if not hasattr(os, 'setpriority'):
+            return
+
+        # Linux keeps the niceness per thread, so every thread the process has started so far is changed
+        threadIds = [pid]
+        try:
+            threadIds = [int(t) for t in os.listdir('/proc/' + str(pid) + '/task')]
+        except OSError:
+            pass
+
+        for threadId in threadIds:
+            try:
+                os.setpriority(os.PRIO_PROCESS, threadId, niceness)
+            except OSError:
+                pass
@@ -3,6 +3,8 @@ import os
 
 class FileHelper:
     METADATA_FILE_NAME = 'metadata.json'
+    RENDER_MANIFEST_FILE_NAME = 'renderjob.json'
+    RENDER_STATS_FILE_NAME = 'renderstats.db'
 
     @staticmethod
     def getUniqueFileName(filePath):
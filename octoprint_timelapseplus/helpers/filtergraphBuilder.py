@@ -0,0 +1,93 @@
+from ..model.combineMethod import CombineMethod
+
+
+class FiltergraphBuilder:
+
+    @staticmethod
+    def canCompile(enhancementPreset, renderPreset, videoFormat):
+        ep = enhancementPreset
+        rp = renderPreset
+
+        # Normalizing and deflickering need the analyzed values of every frame
+        if ep.NORMALIZE or ep.DEFLICKER:
+            return False
+
+        # PIL's contrast pivots around the mean of each frame and equalizing needs its histogram, FFmpeg has no exact equivalent
+        if ep.ENHANCE and (ep.EQUALIZE or ep.CONTRAST != 1):
+            return False
+
+        if ep.BLUR and ep.BLUR_MASK is None:
+            return False
+
+        # The timecodes are drawn from the glyph atlas and cached layers of the Timecode Renderer
+        if ep.TIMECODE:
+            return False
+
+        if rp.COMBINE and rp.COMBINE_METHOD != CombineMethod.DROP:
+            return False
+
+        if rp.PPROLL:
+            return False
+
+        # minterpolate only uses a single core, the staged pipeline can interpolate in parallel windows instead
+        if rp.INTERPOLATE:
+            return False
+
+        if videoFormat.CREATE_PALETTE:
+            return False
+
+        return True
+
+    @staticmethod
+    def build(enhancementPreset, renderPreset, frameSize, totalFrames, fadeInFrames, fadeOutFrames):
+        ep = enhancementPreset
+        rp = renderPreset
+
+        inputArgs = []
+        graph = []
+        inputs = '[0:v]'
+        filters = ['format=rgb24']
+
+        if ep.ENHANCE and ep.BRIGHTNESS != 1:
+            factor = str(ep.BRIGHTNESS)
+            filters.append('lutrgb=r=val*' + factor + ':g=val*' + factor + ':b=val*' + factor)
+
+        if ep.BLUR:
+            inputArgs += ['-i', ep.BLUR_MASK.PATH]
+            graph.append(inputs + ','.join(filters + ['split']) + '[base][toblur]')
+            graph.append('[toblur]gblur=sigma=' + str(ep.BLUR_RADIUS) + '[blurred]')
+            graph.append('[1:v]format=gray,scale=' + str(frameSize[0]) + ':' + str(frameSize[1]) + ':flags=lanczos[mask]')
+            graph.append('[blurred][mask]alphamerge[masked]')
+            inputs = '[base][masked]'
+            filters = ['overlay=format=rgb']
+
+        if rp.RESIZE:
+            filters.append('scale=' + str(rp.RESIZE_W) + ':' + str(rp.RESIZE_H) + ':flags=lanczos')
+
+        filters += FiltergraphBuilder.buildFadeFilters(rp.FADE_COLOR, totalFrames, fadeInFrames, fadeOutFrames)
+
+        graph.append(inputs + ','.join(filters) + '[out]')
+        return inputArgs, ';'.join(graph)
+
+    @staticmethod
+    def buildFadeFilters(fadeColor, totalFrames, fadeInFrames, fadeOutFrames):
+        filters = []
+        if fadeInFrames > 0:
+            filters.append('fade=t=in:s=0:n=' + str(fadeInFrames) + ':c=' + fadeColor)
+        if fadeOutFrames > 0:
+            filters.append('fade=t=out:s=' + str(totalFrames - fadeOutFrames) + ':n=' + str(fadeOutFrames) + ':c=' + fadeColor)
+        return filters
+
+    @staticmethod
+    def buildSegmentFadeFilters(fadeColor, framerate, totalFrames, fadeInFrames, fadeOutFrames, startFrame):
+        # A segment starts at its position in the whole video, so the fades can be placed by time
+        if fadeInFrames == 0 and fadeOutFrames == 0:
+            return []
+
+        filters = ['setpts=PTS+' + str(startFrame) + '/(' + str(framerate) + '*TB)']
+        if fadeInFrames > 0:
+            filters.append('fade=t=in:st=0:d=' + str(fadeInFrames / framerate) + ':c=' + fadeColor)
+        if fadeOutFrames > 0:
+            filters.append('fade=t=out:st=' + str((totalFrames - fadeOutFrames) / framerate) + ':d=' + str(fadeOutFrames / framerate) + ':c=' + fadeColor)
+        filters.append('setpts=PTS-STARTPTS')
+        return filters
@@ -39,7 +39,7 @@ class FormatHelper:
             Format('mpeg2-nq', 'MPEG', 'Normal Quality', 'mpg', 'video/mpeg', 'MPEG-2', 'mpeg2video', {'-qscale:v': '10', '-pix_fmt': 'yuv420p'}),
             Format('mpeg2-hq', 'MPEG', 'High Quality', 'mpg', 'video/mpeg', 'MPEG-2', 'mpeg2video', {'-qscale:v': '2', '-pix_fmt': 'yuv420p'}),
 
-            Format('gif', 'GIF', None, 'gif', 'image/gif', None, ['gif', 'png'], {'-i': 'palette.png', '-filter_complex': '[0:v][1:v]paletteuse'}, True),
+            Format('gif', 'GIF', None, 'gif', 'image/gif', None, ['gif', 'png'], {}, True),
             Format('gif-nopalette', 'GIF', 'Low Quality', 'gif', 'image/gif', None, ['gif', 'png'])
         ]
 
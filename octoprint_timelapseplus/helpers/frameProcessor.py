@@ -0,0 +1,193 @@
+import io
+import os
+
+import numpy as np
+from PIL import Image, ImageEnhance
+
+from .imageCombineHelper import ImageCombineHelper
+from .listHelper import ListHelper
+from .ppRollRenderer import PPRollRenderer
+from .stageUsage import StageUsage
+from .timecodeRenderer import TimecodeRenderer
+from ..model.frameTimecodeInfo import FrameTimecodeInfo
+
+
+class FrameProcessor:
+    ANALYSIS_DRAFT_SCALE = 8
+
+    def __init__(self, baseFolder, frameSource, frameStore, enhancementPreset, renderPreset, metadata):
+        self._basefolder = baseFolder
+        self.FRAME_SOURCE = frameSource
+        self.FRAME_STORE = frameStore
+        self.ENHANCEMENT_PRESET = enhancementPreset
+        self.RENDER_PRESET = renderPreset
+        self.METADATA = metadata
+
+        self.TIMECODE_RENDERER = TimecodeRenderer(baseFolder)
+        self.PPROLL_RENDERER = PPRollRenderer(baseFolder)
+
+        self.ANALYZED_VALUES = None
+        self.TARGET_BRIGHTNESS = 0
+        self.TARGET_CONTRAST = 0
+        self.DEFLICKER_GAINS = {}
+
+        # Operators are applied in this order on every frame while it's decoded in memory
+        self.OPERATORS_ENHANCE = []
+        self.OPERATORS_RENDER = []
+        self.OPERATORS_OUTPUT = []
+        self.DRAFT_SIZE = None
+
+    def setup(self, addTimecodes):
+        ep = self.ENHANCEMENT_PRESET
+        rp = self.RENDER_PRESET
+
+        self.OPERATORS_ENHANCE = []
+        if ep.DEFLICKER:
+            self.OPERATORS_ENHANCE.append(self.deflicker)
+        if ep.NORMALIZE:
+            self.OPERATORS_ENHANCE.append(self.normalize)
+        if ep.ENHANCE:
+            self.OPERATORS_ENHANCE.append(self.enhance)
+        if ep.BLUR:
+            self.OPERATORS_ENHANCE.append(self.blur)
+
+        self.OPERATORS_RENDER = []
+        if rp.RESIZE:
+            self.OPERATORS_RENDER.append(self.resize)
+
+        # The blur radius and mask are relative to the captured frame size, so those frames have to be decoded completely
+        self.DRAFT_SIZE = None
+        if rp.RESIZE and not ep.BLUR:
+            self.DRAFT_SIZE = (rp.RESIZE_W, rp.RESIZE_H)
+
+        self.OPERATORS_OUTPUT = []
+        if ep.TIMECODE and addTimecodes:
+            self.OPERATORS_OUTPUT.append(self.timecode)
+
+    def setAnalyzedValues(self, analyzedValues):
+        self.ANALYZED_VALUES = analyzedValues
+        self.TARGET_BRIGHTNESS = sum(v[0] for v in analyzedValues.values()) / len(analyzedValues)
+        self.TARGET_CONTRAST = sum(v[1] for v in analyzedValues.values()) / len(analyzedValues)
+
+        self.DEFLICKER_GAINS = {}
+        if self.ENHANCEMENT_PRESET.DEFLICKER:
+            brightnessValues = (v[0] for v in analyzedValues.values())
+            smoothedValues = ListHelper.rollingMean(brightnessValues, self.ENHANCEMENT_PRESET.DEFLICKER_WINDOW)
+            for (frame, v), smoothed in zip(analyzedValues.items(), smoothedValues):
+                self.DEFLICKER_GAINS[frame] = smoothed / v[0] if v[0] > 0 else 1
+
+    @staticmethod
+    def applyOperators(operators, img, frame):
+        for op in operators:
+            imgRes = op(img, frame)
+            if imgRes is not img:
+                img.close()
+            img = imgRes
+        return img
+
+    @staticmethod
+    def analyzeBrightnessAndContrast(image):
+        if image.mode == 'L':
+            pixels = np.asarray(image)
+        else:
+            grayscaleImage = image.convert('L')
+            pixels = np.asarray(grayscaleImage)
+            grayscaleImage.close()
+
+        brightness = pixels.mean(dtype=np.float64)
+        contrast = pixels.std(dtype=np.float64)
+        return float(brightness), float(contrast)
+
+    def analyzeFrame(self, frame):
+        with self.FRAME_SOURCE.open(frame) as img:
+            # JPEGs are decoded straight to grayscale at a fraction of their size, the statistics stay practically the same
+            img.draft('L', (img.width // self.ANALYSIS_DRAFT_SCALE, img.height // self.ANALYSIS_DRAFT_SCALE))
+            return self.analyzeBrightnessAndContrast(img)
+
+    def loadFrame(self, frame):
+        img = self.FRAME_SOURCE.open(frame)
+        return self.applyOperators(self.OPERATORS_ENHANCE, img, frame)
+
+    def loadFrameResized(self, frame):
+        img = self.FRAME_SOURCE.open(frame)
+        if self.DRAFT_SIZE is not None:
+            # JPEGs are decoded at the smallest 1/2, 1/4 or 1/8 scale that isn't smaller than the target, the resize only corrects the rest
+            img.draft('RGB', self.DRAFT_SIZE)
+
+        img = self.applyOperators(self.OPERATORS_ENHANCE, img, frame)
+        return self.applyOperators(self.OPERATORS_RENDER, img, frame)
+
+    def renderChunk(self, chunk):
+        img = ImageCombineHelper.createCombinedImage(chunk, self.RENDER_PRESET.COMBINE_METHOD, self.loadFrameResized)
+        return self.applyOperators(self.OPERATORS_OUTPUT, img, chunk[-1])
+
+    def processChunk(self, j):
+        chunk, outFile = j
+        img = self.renderChunk(chunk)
+        self.FRAME_STORE.save(img, outFile)
+        img.close()
+
+    def renderPPRollFrame(self, j):
+        ratio, frames, outFile, phase = j
+        img = self.PPROLL_RENDERER.renderFrame(ratio, frames, self.RENDER_PRESET, phase, self.METADATA, self.loadFrame)
+        img = self.applyOperators(self.OPERATORS_RENDER, img, outFile)
+        self.FRAME_STORE.save(img, outFile)
+        img.close()
+
+    def renderStreamFrame(self, j):
+        source, isChunk, thumbFile = j
+
+        if isChunk:
+            img = self.renderChunk(source)
+        else:
+            img = Image.open(source)
+            StageUsage.countRead(os.path.getsize(source))
+
+        if img.mode != 'RGB':
+            imgRgb = img.convert('RGB')
+            img.close()
+            img = imgRgb
+
+        if thumbFile is not None:
+            img.save(thumbFile, quality=75)
+
+        buf = io.BytesIO()
+        img.save(buf, format='PPM')
+        img.close()
+        return buf.getvalue()
+
+    def deflicker(self, img, frame):
+        gain = self.DEFLICKER_GAINS[frame]
+        lut = [min(255, round(i * gain)) for i in range(256)]
+        return img.point(lut * len(img.getbands()))
+
+    def normalize(self, img, frame):
+        frameBrightness, frameContrast = self.ANALYZED_VALUES[frame]
+
+        # A deflickered frame was already scaled towards its smoothed brightness
+        gain = self.DEFLICKER_GAINS.get(frame, 1)
+        frameBrightness = frameBrightness * gain
+        frameContrast = frameContrast * gain
+
+        factorBrightness = self.TARGET_BRIGHTNESS / frameBrightness
+        imgRes1 = ImageEnhance.Brightness(img).enhance(factorBrightness)
+
+        # Scaling every pixel by the brightness factor scales the standard deviation by the same factor (apart from clipped highlights)
+        factorContrast = self.TARGET_CONTRAST / (frameContrast * factorBrightness)
+        imgRes2 = ImageEnhance.Contrast(imgRes1).enhance(factorContrast)
+
+        imgRes1.close()
+        return imgRes2
+
+    def enhance(self, img, frame):
+        return self.ENHANCEMENT_PRESET.applyEnhance(img)
+
+    def blur(self, img, frame):
+        return self.ENHANCEMENT_PRESET.applyBlur(img)
+
+    def resize(self, img, frame):
+        return self.RENDER_PRESET.applyResize(img)
+
+    def timecode(self, img, frame):
+        frameInfo = FrameTimecodeInfo(self.METADATA['timestamps'][os.path.basename(frame)], self.METADATA['started'], self.METADATA['ended'])
+        return self.TIMECODE_RENDERER.applyTimecode(img, self.ENHANCEMENT_PRESET, frameInfo)
@@ -0,0 +1,53 @@
+import glob
+import os
+
+from .stageUsage import StageUsage
+from ..model.intermediateFormat import IntermediateFormat
+
+
+class FrameStore:
+    def __init__(self, folder, format):
+        self.FOLDER = folder
+        self.FORMAT = format
+
+        self.EXTENSION = 'jpg'
+        if format == IntermediateFormat.PNG:
+            self.EXTENSION = 'png'
+        elif format == IntermediateFormat.RAW:
+            self.EXTENSION = 'ppm'
+
+    def getFileName(self, name):
+        return name + '.' + self.EXTENSION
+
+    def getFile(self, name):
+        return self.FOLDER + '/' + self.getFileName(name)
+
+    def getPattern(self, prefix):
+        return prefix + '%05d.' + self.EXTENSION
+
+    def listFiles(self, prefix):
+        return sorted(glob.glob(self.FOLDER + '/' + prefix + '*.' + self.EXTENSION))
+
+    def save(self, img, file):
+        if self.FORMAT == IntermediateFormat.PNG:
+            img.save(file, format='PNG', compress_level=1)
+        elif self.FORMAT == IntermediateFormat.RAW:
+            img.save(file, format='PPM')
+        else:
+            img.save(file, format='JPEG', quality=100, subsampling=0)
+
+        StageUsage.countWritten(os.path.getsize(file))
+
+    def getFfmpegInputArgs(self):
+        if self.FORMAT == IntermediateFormat.PNG:
+            return ['-f', 'image2pipe', '-c:v', 'png']
+        if self.FORMAT == IntermediateFormat.RAW:
+            return ['-f', 'image2pipe', '-c:v', 'ppm']
+        return ['-f', 'image2pipe', '-c:v', 'mjpeg']
+
+    def getFfmpegOutputArgs(self):
+        if self.FORMAT == IntermediateFormat.PNG:
+            return ['-compression_level', '1']
+        if self.FORMAT == IntermediateFormat.RAW:
+            return []
+        return ['-qscale:v', '1']
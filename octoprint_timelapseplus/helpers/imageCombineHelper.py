@@ -1,58 +1,126 @@
+import numpy as np
 from PIL import Image
 
 from ..model.combineMethod import CombineMethod
 
 
 class ImageCombineHelper:
+    # Every frame of a weighted blend counts this much less than the frame after it
+    WEIGHTED_DECAY = 0.5
+
+    # Share of the darkest and brightest values per pixel a trimmed mean ignores on each side
+    TRIMMED_MEAN_CUT = 0.25
+
+    # Upper bound for the bytes of one tile of the frame stack median and trimmed mean work on
+    STACK_TILE_BYTES = 32 * 1024 * 1024
+
+    # Larger stacks are sorted with NumPy, the sorting network grows quadratically with the number of frames
+    SORT_NETWORK_MAX_FRAMES = 32
+
     @staticmethod
-    def createCombinedImage(imagePaths, method):
+    def createCombinedImage(imagePaths, method, loadFn=Image.open):
         if len(imagePaths) == 1:
-            return Image.open(imagePaths[0])
+            return loadFn(imagePaths[0])
 
         if method == CombineMethod.DROP:
-            return ImageCombineHelper.createDrop(imagePaths)
+            return ImageCombineHelper.createDrop(imagePaths, loadFn)
         if method == CombineMethod.BLEND:
-            return ImageCombineHelper.createBlend(imagePaths)
+            return ImageCombineHelper.createBlend(imagePaths, loadFn)
         if method == CombineMethod.BLEND_WEIGHTED:
-            return ImageCombineHelper.createBlendWeighted(imagePaths)
+            return ImageCombineHelper.createBlendWeighted(imagePaths, loadFn)
+        if method == CombineMethod.MEDIAN:
+            return ImageCombineHelper.createStacked(imagePaths, ImageCombineHelper.stackMedian, loadFn)
+        if method == CombineMethod.TRIMMED_MEAN:
+            return ImageCombineHelper.createStacked(imagePaths, ImageCombineHelper.stackTrimmedMean, loadFn)
 
     @staticmethod
-    def createDrop(imgList):
-        return Image.open(imgList[-1])
+    def createDrop(imgList, loadFn=Image.open):
+        return loadFn(imgList[-1])
 
     @staticmethod
-    def createBlend(imagePaths):
-        images = []
-        for path in imagePaths:
-            with Image.open(path) as image:
-                images.append(image.convert('RGBA'))
+    def loadPixels(path, loadFn):
+        with loadFn(path) as image:
+            if image.mode == 'RGB':
+                return np.asarray(image)
 
-        width, height = images[0].size
-        blendedImage = Image.new('RGBA', (width, height), (0, 0, 0))
-        for image in images:
-            blendedImage = Image.blend(blendedImage, image, 1 / len(images))
+            with image.convert('RGB') as imageRgb:
+                return np.asarray(imageRgb)
 
-        for i in images:
-            i.close()
+    @staticmethod
+    def createBlend(imagePaths, loadFn=Image.open):
+        # Frames are summed up one after another, so only a single decoded frame is held in memory
+        acc = None
+        for path in imagePaths:
+            pixels = ImageCombineHelper.loadPixels(path, loadFn)
+            if acc is None:
+                acc = np.zeros(pixels.shape, dtype=np.uint32)
+            acc += pixels
 
-        return blendedImage.convert('RGB')
+        count = len(imagePaths)
+        acc += count // 2
+        acc //= count
+        return Image.fromarray(acc.astype(np.uint8), 'RGB')
 
     @staticmethod
-    def createBlendWeighted(imagePaths):
-        images = []
+    def createBlendWeighted(imagePaths, loadFn=Image.open):
+        # Exponentially weighted mean, the last frame of the chunk has the highest weight
+        acc = None
+        totalWeight = 0.0
         for path in imagePaths:
-            with Image.open(path).convert('RGBA') as image:
-                images.append(image)
+            pixels = ImageCombineHelper.loadPixels(path, loadFn)
+            if acc is None:
+                acc = np.zeros(pixels.shape, dtype=np.float32)
+            else:
+                acc *= ImageCombineHelper.WEIGHTED_DECAY
+            acc += pixels
+            totalWeight = totalWeight * ImageCombineHelper.WEIGHTED_DECAY + 1
+
+        acc /= totalWeight
+        np.rint(acc, out=acc)
+        return Image.fromarray(acc.astype(np.uint8), 'RGB')
 
-        width, height = images[0].size
-        blendedImage = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    @staticmethod
+    def sortStack(stack):
+        # Small stacks are sorted in place by an odd-even transposition network of element wise min/max operations,
+        # which is a lot faster than sorting millions of tiny per pixel lists
+        count = len(stack)
+        if count > ImageCombineHelper.SORT_NETWORK_MAX_FRAMES:
+            return np.sort(stack, axis=0)
+
+        tmp = np.empty_like(stack[0])
+        for r in range(count):
+            for i in range(r % 2, count - 1, 2):
+                np.minimum(stack[i], stack[i + 1], out=tmp)
+                np.maximum(stack[i], stack[i + 1], out=stack[i + 1])
+                stack[i] = tmp
+        return stack
+
+    @staticmethod
+    def stackMedian(stackSorted):
+        count = len(stackSorted)
+        if count % 2 == 1:
+            return stackSorted[count // 2]
+        return stackSorted[count // 2 - 1:count // 2 + 1].mean(axis=0)
+
+    @staticmethod
+    def stackTrimmedMean(stackSorted):
+        count = len(stackSorted)
+        cut = int(count * ImageCombineHelper.TRIMMED_MEAN_CUT)
+        return stackSorted[cut:count - cut].mean(axis=0)
+
+    @staticmethod
+    def createStacked(imagePaths, reduceFn, loadFn=Image.open):
+        # Per pixel statistics over all frames, e.g. to remove the moving print head.
+        # The frames are kept as compact uint8 arrays and processed in horizontal tiles to bound the temporary buffers.
+        frames = [ImageCombineHelper.loadPixels(path, loadFn) for path in imagePaths]
+        height, width, channels = frames[0].shape
+        out = np.empty((height, width, channels), dtype=np.uint8)
 
-        totalWeight = sum(2 ** i for i in range(len(images)))
-        for i, image in enumerate(images):
-            weight = 2 ** (len(images) - i - 1) / totalWeight
-            blendedImage = Image.blend(blendedImage, image, 2 * weight)
+        rowBytes = len(frames) * width * channels * 8
+        tileRows = max(1, ImageCombineHelper.STACK_TILE_BYTES // rowBytes)
 
-        for i in images:
-            i.close()
+        for y in range(0, height, tileRows):
+            stack = np.stack([f[y:y + tileRows] for f in frames])
+            out[y:y + tileRows] = np.rint(reduceFn(ImageCombineHelper.sortStack(stack)))
 
-        return blendedImage.convert('RGB')
+        return Image.fromarray(out, 'RGB')
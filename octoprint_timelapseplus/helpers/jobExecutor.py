@@ -1,34 +1,123 @@
-import concurrent
-import os
+import concurrent.futures
+import multiprocessing
+from collections import deque
+from threading import Lock
+
+from .cpuHelper import CpuHelper
+from .stageUsage import StageUsage
+
+_WORKER_TARGET = None
+
+
+def _initWorker(target):
+    global _WORKER_TARGET
+    _WORKER_TARGET = target
+
+
+def _runInWorker(methodName, job):
+    return StageUsage.measureProcess(getattr(_WORKER_TARGET, methodName), job)
 
 
 class JobExecutor:
+    # Forking the multithreaded OctoPrint server could copy locks held by its other threads into the workers
+    PROCESS_START_METHOD = 'spawn'
 
-    def __init__(self, settings, jobs, callbackExecute, callbackProgress):
+    def __init__(self, settings, jobs, callbackExecute, callbackProgress, useProcesses=False, callbackThrottle=None, stageUsage=None):
         self._settings = settings
         self.JOBS = jobs
         self.COUNT_JOBS = len(jobs)
 
         self.CALLBACK_EXECUTE = callbackExecute
         self.CALLBACK_PROGRESS = callbackProgress
+        self.CALLBACK_THROTTLE = callbackThrottle
+        self.STAGE_USAGE = stageUsage
 
         self.LAST_PROGRESS = 0
+        self._progressLock = Lock()
 
-        self.CPU_COUNT = os.cpu_count()
+        self.CPU_COUNT = CpuHelper.getAvailableCpuCount()
+        self.USE_PROCESSES = useProcesses and self._settings.get(["renderMultiprocessing"])
 
-    def start(self):
+    def getNumWorkers(self):
         numWorkers = 1
         if self._settings.get(["renderMultithreading"]):
             numWorkers = max(1, int(self.CPU_COUNT / 2))
+        return numWorkers
+
+    def getMaxPending(self):
+        numWorkers = self.getNumWorkers()
+        if self.CALLBACK_THROTTLE is None:
+            return numWorkers * 2
+
+        # The throttle callback may block, e.g. while a print is capturing
+        allowedWorkers = self.CALLBACK_THROTTLE(numWorkers)
+        if allowedWorkers < numWorkers:
+            return max(1, allowedWorkers)
+        return numWorkers * 2
+
+    def createExecutor(self):
+        numWorkers = self.getNumWorkers()
+
+        if not self.USE_PROCESSES or numWorkers == 1:
+            return concurrent.futures.ThreadPoolExecutor(max_workers=numWorkers)
+
+        context = multiprocessing.get_context(self.PROCESS_START_METHOD)
+
+        # The object behind a bound callback is sent to every worker once instead of with every job
+        target = getattr(self.CALLBACK_EXECUTE, '__self__', None)
+        if target is not None:
+            return concurrent.futures.ProcessPoolExecutor(max_workers=numWorkers, mp_context=context, initializer=_initWorker, initargs=(target,))
+
+        return concurrent.futures.ProcessPoolExecutor(max_workers=numWorkers, mp_context=context)
+
+    def submitJob(self, executor, job):
+        # Every job returns its result together with the CPU time and file I/O it caused
+        if isinstance(executor, concurrent.futures.ProcessPoolExecutor):
+            if hasattr(self.CALLBACK_EXECUTE, '__self__'):
+                return executor.submit(_runInWorker, self.CALLBACK_EXECUTE.__name__, job)
+            return executor.submit(StageUsage.measureProcess, self.CALLBACK_EXECUTE, job)
+
+        return executor.submit(StageUsage.measureThread, self.CALLBACK_EXECUTE, job)
+
+    def getResult(self, future):
+        result, usage = future.result()
+        if self.STAGE_USAGE is not None:
+            self.STAGE_USAGE.add(usage)
+        return result
+
+    def start(self):
+        with self.createExecutor() as executor:
+            futures = []
+            pending = set()
+            for job in self.JOBS:
+                maxPending = self.getMaxPending()
+                while len(pending) >= maxPending:
+                    done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+
+                future = self.submitJob(executor, job)
+                future.add_done_callback(lambda f: self.increaseProgress())
+                futures.append(future)
+                pending.add(future)
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=numWorkers) as executor:
-            futures = [executor.submit(self.processJob, job) for job in self.JOBS]
             concurrent.futures.wait(futures)
+            return [self.getResult(f) for f in futures]
 
-    def increaseProgress(self):
-        self.LAST_PROGRESS = self.LAST_PROGRESS + 1
-        self.CALLBACK_PROGRESS(self.LAST_PROGRESS / self.COUNT_JOBS)
+    def stream(self):
+        # Yields the results in job order while only keeping a few jobs in flight
+        with self.createExecutor() as executor:
+            pending = deque()
+            for job in self.JOBS:
+                maxPending = self.getMaxPending()
+                while len(pending) >= maxPending:
+                    yield self.getResult(pending.popleft())
 
-    def processJob(self, job):
-        self.CALLBACK_EXECUTE(job)
-        self.increaseProgress()
+                pending.append(self.submitJob(executor, job))
+
+            while len(pending) > 0:
+                yield self.getResult(pending.popleft())
+
+    def increaseProgress(self):
+        with self._progressLock:
+            self.LAST_PROGRESS = self.LAST_PROGRESS + 1
+            progress = self.LAST_PROGRESS / self.COUNT_JOBS
+        self.CALLBACK_PROGRESS(progress)
@@ -1,4 +1,5 @@
 import re
+from collections import deque
 
 
 class ListHelper:
@@ -11,6 +12,35 @@ class ListHelper:
     def rangeList(n):
         return [i for i in range(1, n + 1)]
 
+    @staticmethod
+    def rollingMean(values, windowSize):
+        # Centered moving average that only keeps the current window in memory, the window shrinks at both ends
+        half = windowSize // 2
+        window = deque()
+        total = 0.0
+        left = 0
+        center = 0
+        count = 0
+
+        for v in values:
+            window.append(v)
+            total += v
+            count += 1
+
+            if count - 1 - center == half:
+                while left < center - half:
+                    total -= window.popleft()
+                    left += 1
+                yield total / len(window)
+                center += 1
+
+        while center < count:
+            while left < center - half:
+                total -= window.popleft()
+                left += 1
+            yield total / len(window)
+            center += 1
+
     @staticmethod
     def extractFileposFromGcodeTag(tags):
         try:
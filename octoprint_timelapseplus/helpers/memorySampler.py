@@ -0,0 +1,85 @@
+import os
+from threading import Event, Thread
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class MemorySampler:
+    # Seconds between two samples of the process tree
+    INTERVAL = 0.05
+
+    def __init__(self):
+        self.PEAK_RSS = 0
+        self._stop = Event()
+        self._thread = None
+
+    @staticmethod
+    def canSampleProcessTree():
+        return os.path.isfile('/proc/self/status')
+
+    @staticmethod
+    def getChildren(pid):
+        children = []
+        try:
+            for task in os.listdir('/proc/' + str(pid) + '/task'):
+                with open('/proc/' + str(pid) + '/task/' + task + '/children', 'r') as f:
+                    children += [int(c) for c in f.read().split()]
+        except OSError:
+            pass
+        return children
+
+    @staticmethod
+    def getRss(pid):
+        try:
+            with open('/proc/' + str(pid) + '/status', 'r') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return 0
+
+    @staticmethod
+    def getTreeRss():
+        # RSS of this process together with its worker processes and FFmpeg
+        total = 0
+        pending = [os.getpid()]
+        while len(pending) > 0:
+            pid = pending.pop()
+            total += MemorySampler.getRss(pid)
+            pending += MemorySampler.getChildren(pid)
+        return total
+
+    @staticmethod
+    def getMaxRss():
+        # Without /proc only the high water marks of the process and its finished children are known
+        if resource is None:
+            return 0
+        selfRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        childrenRss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        return (selfRss + childrenRss) * 1024
+
+    def run(self):
+        while not self._stop.is_set():
+            self.PEAK_RSS = max(self.PEAK_RSS, self.getTreeRss())
+            self._stop.wait(self.INTERVAL)
+
+    def start(self):
+        if not self.canSampleProcessTree():
+            return
+
+        self._thread = Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            self.PEAK_RSS = self.getMaxRss()
+            return self.PEAK_RSS
+
+        self._stop.set()
+        self._thread.join()
+        self.PEAK_RSS = max(self.PEAK_RSS, self.getTreeRss())
+        return self.PEAK_RSS
@@ -12,8 +12,23 @@ from ..model.ppRollType import PPRollType
 
 
 class PPRollRenderer:
-    @staticmethod
-    def renderFrame(ratio, frames, preset, phase, metadata, baseFolder):
+    # Strong blurs are applied to a downscaled level of the source with at least this radius left
+    BLUR_LEVEL_RADIUS = 4
+
+    def __init__(self, baseFolder):
+        self._basefolder = baseFolder
+
+        self._stillLevels = {}
+        self._textLayers = {}
+
+    def __getstate__(self):
+        # Worker processes build their own caches
+        state = self.__dict__.copy()
+        state['_stillLevels'] = {}
+        state['_textLayers'] = {}
+        return state
+
+    def renderFrame(self, ratio, frames, preset, phase, metadata, loadFn=Image.open):
         ppBlur = preset.PPROLL_PRE_BLUR
         ppType = preset.PPROLL_PRE_TYPE
         ppEaseFn = preset.PPROLL_PRE_EASE_FN
@@ -29,78 +44,129 @@ class PPRollRenderer:
         else:
             ratio = PPRollRenderer.applyEaseFn(ppEaseFn, ratio)
 
-        img = None
-
-        if ppType == PPRollType.STILL:
-            img = PPRollRenderer.getStillFrame(frames, phase)
-        elif ppType == PPRollType.STILL_FINAL:
-            img = PPRollRenderer.getStillFrame(frames, PPRollPhase.POST)
-        elif ppType == PPRollType.LAPSE:
-            reverse = (phase == PPRollPhase.POST)
-            img = PPRollRenderer.getLapseFrame(frames, ratio, reverse)
-
+        blurRadius = 0
         if ppBlur:
             blurRadius = ratio * preset.PPROLL_BLUR_RADIUS
-            img = img.filter(ImageFilter.GaussianBlur(blurRadius))
 
         zoomFactor = 1.0
         if ppZoom:
             zoomFactor = 1 + ratio * (preset.PPROLL_ZOOM_FACTOR - 1)
-            img = PPRollRenderer.zoomImage(img, zoomFactor)
-
-        if preset.PPROLL_TEXT and phase == PPRollPhase.PRE:
-            if metadata is None:
-                raise Exception('The Frame Collection doesn\'t contain any Metadata. Pre/Post Roll Text can\'t be added.')
-
-            printName = metadata['baseName']
-            match = re.search(preset.PPROLL_TEXT_REGEX, printName)
-            gList = match.groups() if match else [printName]
-            printName = '\n'.join(gList)
-
-            imgW, imgH = img.size
-            textSize = int(imgH * preset.PPROLL_TEXT_SIZE / 100)
-            textSpacing = int(textSize / 4)
-            textPadding = int(textSize / 3)
-            fnt = ImageFont.truetype(baseFolder + '/static/assets/fonts/Inconsolata-Bold.ttf', textSize)
 
-            colText = ColorHelper.hexToRgba(preset.PPROLL_TEXT_FOREGROUND, max(0, ratio - 0.2))
-            colBg = ColorHelper.hexToRgba(preset.PPROLL_TEXT_BACKGROUND, max(0, ratio - 0.2) * 0.5)
-
-            imgText = Image.new('RGBA', img.size)
-            draw = ImageDraw.Draw(imgText, 'RGBA')
+        if ppType == PPRollType.LAPSE:
+            reverse = (phase == PPRollPhase.POST)
+            levels = self.createLevels(PPRollRenderer.getLapseFrame(frames, ratio, reverse, loadFn), blurRadius)
+        else:
+            # Still frames are decoded once per phase, together with the downscaled levels their blur needs
+            stillPhase = PPRollPhase.POST if ppType == PPRollType.STILL_FINAL else phase
+            stillFrame = PPRollRenderer.getStillFrameName(frames, stillPhase)
+            if stillFrame not in self._stillLevels:
+                maxBlurRadius = preset.PPROLL_BLUR_RADIUS if ppBlur else 0
+                self._stillLevels[stillFrame] = self.createLevels(loadFn(stillFrame), maxBlurRadius)
+            levels = self._stillLevels[stillFrame]
 
-            textBbox = draw.multiline_textbbox((0, 0), printName, font=fnt, anchor='la', spacing=textSpacing)
-            backgroundBbox = (0, 0, textBbox[2] + 2 * textPadding, textBbox[3] + 2 * textPadding)
+        img = self.transformFrame(levels, blurRadius, zoomFactor)
 
-            offsX = int(imgW / 2 - backgroundBbox[2] / 2)
-            offsY = int(imgH / 2 - backgroundBbox[3] / 2)
+        if ppType == PPRollType.LAPSE:
+            for level in levels:
+                level.close()
 
-            draw.rectangle((offsX, offsY, offsX + backgroundBbox[2], offsY + backgroundBbox[3]), fill=colBg)
-            draw.multiline_text((offsX + textPadding, offsY + textPadding), printName, align='center', font=fnt, fill=colText, anchor='la', spacing=textSpacing)
+        if preset.PPROLL_TEXT and phase == PPRollPhase.PRE:
+            if metadata is None:
+                raise Exception('The Frame Collection doesn\'t contain any Metadata. Pre/Post Roll Text can\'t be added.')
 
-            textZoom = 0.6 + zoomFactor * 0.4
-            imgText = PPRollRenderer.zoomImage(imgText, textZoom)
+            opacity = max(0, ratio - 0.2)
+            if opacity > 0:
+                textZoom = 0.6 + zoomFactor * 0.4
+                self.applyText(img, preset, metadata, opacity, textZoom)
 
-            img.paste(imgText, (0, 0), imgText)
-            imgText.close()
+        return img
 
+    def createLevels(self, img, maxBlurRadius):
+        levels = [img]
+        while maxBlurRadius / 2 ** len(levels) >= self.BLUR_LEVEL_RADIUS and min(levels[-1].size) >= 32:
+            levels.append(levels[-1].reduce(2))
+        return levels
+
+    def transformFrame(self, levels, blurRadius, zoomFactor):
+        # The blur runs on the smallest level that leaves it enough radius, upscaling and zooming are a single resize
+        level = 0
+        while level + 1 < len(levels) and blurRadius / 2 ** (level + 1) >= self.BLUR_LEVEL_RADIUS:
+            level += 1
+
+        width, height = levels[0].size
+        src = levels[level]
+        scaleX = src.width / width
+        scaleY = src.height / height
+
+        imgBlurred = None
+        if blurRadius > 0:
+            imgBlurred = src.filter(ImageFilter.GaussianBlur(blurRadius * scaleX))
+            src = imgBlurred
+
+        if level == 0 and zoomFactor == 1:
+            return src if imgBlurred is not None else src.copy()
+
+        cropWidth = width / zoomFactor
+        cropHeight = height / zoomFactor
+        left = (width - cropWidth) / 2
+        top = (height - cropHeight) / 2
+        box = (left * scaleX, top * scaleY, (left + cropWidth) * scaleX, (top + cropHeight) * scaleY)
+
+        img = src.resize((width, height), Image.LANCZOS, box=box)
+        if imgBlurred is not None:
+            imgBlurred.close()
         return img
 
-    @staticmethod
-    def zoomImage(image, zoomFactor):
-        if zoomFactor == 1:
-            return image
-
-        width, height = image.size
-        cropWidth = int(width / zoomFactor)
-        cropHeight = int(height / zoomFactor)
-        left = (width - cropWidth) // 2
-        top = (height - cropHeight) // 2
-        right = left + cropWidth
-        bottom = top + cropHeight
-        croppedImage = image.crop((left, top, right, bottom))
-        resizedImage = croppedImage.resize((width, height), Image.LANCZOS)
-        return resizedImage
+    def getTextLayer(self, imgW, imgH, preset, metadata):
+        key = (imgW, imgH, metadata['baseName'], preset.PPROLL_TEXT_REGEX, preset.PPROLL_TEXT_SIZE, preset.PPROLL_TEXT_FOREGROUND, preset.PPROLL_TEXT_BACKGROUND)
+        if key not in self._textLayers:
+            self._textLayers[key] = self.createTextLayer(imgW, imgH, preset, metadata)
+        return self._textLayers[key]
+
+    def createTextLayer(self, imgW, imgH, preset, metadata):
+        # Rendered once at full opacity, frames only scale it and fade its alpha channel
+        printName = metadata['baseName']
+        match = re.search(preset.PPROLL_TEXT_REGEX, printName)
+        gList = match.groups() if match else [printName]
+        printName = '\n'.join(gList)
+
+        textSize = int(imgH * preset.PPROLL_TEXT_SIZE / 100)
+        textSpacing = int(textSize / 4)
+        textPadding = int(textSize / 3)
+        fnt = ImageFont.truetype(self._basefolder + '/static/assets/fonts/Inconsolata-Bold.ttf', textSize)
+
+        colText = ColorHelper.hexToRgba(preset.PPROLL_TEXT_FOREGROUND, 1)
+        colBg = ColorHelper.hexToRgba(preset.PPROLL_TEXT_BACKGROUND, 0.5)
+
+        with Image.new('RGBA', (1, 1)) as dummy:
+            textBbox = ImageDraw.Draw(dummy, 'RGBA').multiline_textbbox((0, 0), printName, font=fnt, anchor='la', spacing=textSpacing)
+        backgroundBbox = (0, 0, textBbox[2] + 2 * textPadding, textBbox[3] + 2 * textPadding)
+
+        imgText = Image.new('RGBA', (backgroundBbox[2] + 1, backgroundBbox[3] + 1))
+        draw = ImageDraw.Draw(imgText, 'RGBA')
+        draw.rectangle(backgroundBbox, fill=colBg)
+        draw.multiline_text((textPadding, textPadding), printName, align='center', font=fnt, fill=colText, anchor='la', spacing=textSpacing)
+
+        offsX = int(imgW / 2 - backgroundBbox[2] / 2)
+        offsY = int(imgH / 2 - backgroundBbox[3] / 2)
+        return imgText, (offsX, offsY)
+
+    def applyText(self, img, preset, metadata, opacity, textZoom):
+        imgW, imgH = img.size
+        imgText, (offsX, offsY) = self.getTextLayer(imgW, imgH, preset, metadata)
+
+        # Zooming the text around the frame center scales its box and its distance to the center by the same factor
+        textW = max(1, round(imgText.width * textZoom))
+        textH = max(1, round(imgText.height * textZoom))
+        imgTextZoomed = imgText.resize((textW, textH), Image.LANCZOS)
+        alpha = imgTextZoomed.getchannel('A').point(lambda a: a * opacity)
+        imgTextZoomed.putalpha(alpha)
+        alpha.close()
+
+        posX = round(imgW / 2 + (offsX - imgW / 2) * textZoom)
+        posY = round(imgH / 2 + (offsY - imgH / 2) * textZoom)
+        img.paste(imgTextZoomed, (posX, posY), imgTextZoomed)
+        imgTextZoomed.close()
 
     @staticmethod
     def applyEaseFn(fn, r):
@@ -117,15 +183,15 @@ class PPRollRenderer:
                 return 0.5 * (math.sqrt(1 - rr * rr) + 1)
 
     @staticmethod
-    def getLapseFrame(frames, ratio, reverse):
+    def getLapseFrame(frames, ratio, reverse, loadFn=Image.open):
         if reverse:
             frames = frames[::-1]
         retFrameIdx = int(round(ratio * (len(frames) - 1)))
-        return Image.open(frames[retFrameIdx])
+        return loadFn(frames[retFrameIdx])
 
     @staticmethod
-    def getStillFrame(frames, phase):
+    def getStillFrameName(frames, phase):
         if phase == PPRollPhase.PRE:
-            return Image.open(frames[0])
+            return frames[0]
         else:
-            return Image.open(frames[-1])
+            return frames[-1]
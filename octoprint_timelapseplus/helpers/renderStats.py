@@ -0,0 +1,73 @@
+import os
+import sqlite3
+import time
+from threading import Lock
+
+from .fileHelper import FileHelper
+from ..log import Log
+
+
+class RenderStats:
+    # Number of recent runs of a stage its expected throughput is averaged from
+    HISTORY_SIZE = 5
+
+    # Columns of the stages table in the order they are inserted
+    COLUMNS = ('created', 'presetHash', 'resolution', 'stage', 'frames', 'wallTime', 'cpuTime', 'framesPerSecond', 'bytesRead', 'bytesWritten', 'peakRss')
+
+    _lock = Lock()
+
+    def __init__(self, dataFolder):
+        self.PATH = dataFolder + '/' + FileHelper.RENDER_STATS_FILE_NAME
+
+    def connect(self):
+        db = sqlite3.connect(self.PATH, timeout=10)
+        db.execute('CREATE TABLE IF NOT EXISTS stages ('
+                   'created REAL, presetHash TEXT, resolution TEXT, stage TEXT, frames INTEGER, '
+                   'wallTime REAL, cpuTime REAL, framesPerSecond REAL, bytesRead INTEGER, bytesWritten INTEGER, peakRss INTEGER)')
+        db.execute('CREATE INDEX IF NOT EXISTS stagesKey ON stages (presetHash, resolution, stage, created)')
+        return db
+
+    def addStage(self, presetHash, resolution, stage, frames, usage):
+        # CPU time and I/O cover the stage's own threads, its workers and FFmpeg. The peak RSS is the one of the whole
+        # OctoPrint process tree while the stage ran, so it includes the server and other Render Jobs.
+        record = (
+            time.time(),
+            presetHash,
+            resolution,
+            stage,
+            frames,
+            usage.WALL_TIME,
+            usage.CPU_TIME,
+            frames / usage.WALL_TIME if usage.WALL_TIME > 0 else 0,
+            usage.BYTES_READ,
+            usage.BYTES_WRITTEN,
+            usage.PEAK_RSS
+        )
+        Log.debug('Render Stage finished', dict(zip(self.COLUMNS, record)))
+
+        # Statistics must never break a render
+        try:
+            with RenderStats._lock:
+                db = self.connect()
+                with db:
+                    db.execute('INSERT INTO stages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', record)
+                db.close()
+        except Exception as e:
+            Log.warning('Failed to store Render Stage Statistics', e)
+
+    def getFramesPerSecond(self, presetHash, resolution, stage):
+        if not os.path.isfile(self.PATH):
+            return None
+
+        try:
+            with RenderStats._lock:
+                db = self.connect()
+                row = db.execute('SELECT AVG(framesPerSecond) FROM '
+                                 '(SELECT framesPerSecond FROM stages WHERE presetHash = ? AND resolution = ? AND stage = ? ORDER BY created DESC LIMIT ?)',
+                                 (presetHash, resolution, stage, self.HISTORY_SIZE)).fetchone()
+                db.close()
+        except Exception as e:
+            Log.warning('Failed to read Render Stage Statistics', e)
+            return None
+
+        return row[0]
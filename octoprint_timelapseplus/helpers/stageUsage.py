@@ -0,0 +1,86 @@
+import time
+from threading import Lock, local
+
+from .memorySampler import MemorySampler
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class StageUsage:
+    # getrusage() counts block I/O in units of 512 bytes
+    BLOCK_SIZE = 512
+
+    # Sizes of the files read and written by the current thread, every thread and worker process has its own counters
+    _threadCounters = local()
+
+    def __init__(self):
+        self.WALL_TIME = 0
+        self.CPU_TIME = 0
+        self.BYTES_READ = 0
+        self.BYTES_WRITTEN = 0
+        self.PEAK_RSS = 0
+
+        self._lock = Lock()
+        self._sampler = MemorySampler()
+        self._timeStart = 0
+
+    def start(self):
+        self._timeStart = time.monotonic()
+        self._sampler.start()
+
+    def stop(self):
+        self.WALL_TIME = time.monotonic() - self._timeStart
+        self.PEAK_RSS = self._sampler.stop()
+
+    def add(self, usage):
+        # Usage is (cpuTime, bytesRead, bytesWritten) as returned by measureThread() and measureProcess()
+        cpuTime, bytesRead, bytesWritten = usage
+        with self._lock:
+            self.CPU_TIME += cpuTime
+            self.BYTES_READ += bytesRead
+            self.BYTES_WRITTEN += bytesWritten
+
+    def addChild(self, rusage):
+        # FFmpeg's I/O is only known from the block I/O the kernel accounted to it
+        self.add((rusage.ru_utime + rusage.ru_stime, rusage.ru_inblock * self.BLOCK_SIZE, rusage.ru_oublock * self.BLOCK_SIZE))
+
+    def runInThread(self, fn, *args):
+        result, usage = StageUsage.measureThread(fn, *args)
+        self.add(usage)
+        return result
+
+    @staticmethod
+    def countRead(numBytes):
+        StageUsage._threadCounters.read = getattr(StageUsage._threadCounters, 'read', 0) + numBytes
+
+    @staticmethod
+    def countWritten(numBytes):
+        StageUsage._threadCounters.written = getattr(StageUsage._threadCounters, 'written', 0) + numBytes
+
+    @staticmethod
+    def getThreadCounters():
+        return getattr(StageUsage._threadCounters, 'read', 0), getattr(StageUsage._threadCounters, 'written', 0)
+
+    @staticmethod
+    def measureThread(fn, *args):
+        # Only the calling thread is measured, other Render Jobs and the OctoPrint server run in other threads of the same process
+        cpuStart = time.thread_time()
+        readStart, writtenStart = StageUsage.getThreadCounters()
+        result = fn(*args)
+        read, written = StageUsage.getThreadCounters()
+        return result, (time.thread_time() - cpuStart, read - readStart, written - writtenStart)
+
+    @staticmethod
+    def measureProcess(fn, *args):
+        # Worker processes only run one job at a time, so their own usage also covers threads started by the job
+        if resource is None:
+            return StageUsage.measureThread(fn, *args)
+
+        usageStart = resource.getrusage(resource.RUSAGE_SELF)
+        result, (cpuTime, read, written) = StageUsage.measureThread(fn, *args)
+        usageEnd = resource.getrusage(resource.RUSAGE_SELF)
+        cpuTime = usageEnd.ru_utime + usageEnd.ru_stime - usageStart.ru_utime - usageStart.ru_stime
+        return result, (cpuTime, read, written)
@@ -10,11 +10,27 @@ from ..model.timecodeType import TimecodeType
 
 
 class TimecodeRenderer:
+    TEXT_CHARSET = '0123456789:hms% ?'
+
     def __init__(self, baseFolder):
         self._basefolder = baseFolder
         self.TEXT_PADDING = 0.1
         self.AA_FACTOR = 3
 
+        self._fonts = {}
+        self._glyphAtlases = {}
+        self._barLayers = {}
+        self._clockBackgrounds = {}
+
+    def __getstate__(self):
+        # Fonts can't be sent to worker processes, every process builds its own caches
+        state = self.__dict__.copy()
+        state['_fonts'] = {}
+        state['_glyphAtlases'] = {}
+        state['_barLayers'] = {}
+        state['_clockBackgrounds'] = {}
+        return state
+
     def getElementPosition(self, imgW, imgH, element, margin, snap):
         elemW, elemH = element.size
 
@@ -55,32 +71,37 @@ class TimecodeRenderer:
 
         elemH = math.ceil(imgH * (preset.TIMECODE_SIZE / 100)) * self.AA_FACTOR
 
+        # Elements are drawn at AA_FACTOR times their size and returned already downscaled
         if type == TimecodeType.BAR:
             elemW = int(imgW / 2) * self.AA_FACTOR
-            elem = self.createElementBar(elemW, elemH, frameInfo.getRatio(), preset.TIMECODE_COLOR_PRIMARY, preset.TIMECODE_COLOR_SECONDARY)
-        elif type == TimecodeType.CLOCK:
-            elem = self.createElementClock(elemH, frameInfo.getDateTime(), True, preset.TIMECODE_COLOR_PRIMARY, preset.TIMECODE_COLOR_SECONDARY)
-        elif type == TimecodeType.CLOCK_NOSECONDS:
-            elem = self.createElementClock(elemH, frameInfo.getDateTime(), False, preset.TIMECODE_COLOR_PRIMARY, preset.TIMECODE_COLOR_SECONDARY)
-        else:
-            text = self.createText(type, frameInfo)
-            elem = self.createElementText(text, elemH, preset.TIMECODE_COLOR_PRIMARY, preset.TIMECODE_COLOR_SECONDARY)
-
-        finW, finH = elem.size
-        elem = elem.resize((finW // self.AA_FACTOR, finH // self.AA_FACTOR), resample=Image.LANCZOS)
-        return elem
-
-    def createElementBar(self, width, height, ratio, colPrimary, colSecondary):
+            return self.createElementBar(elemW, elemH, frameInfo.getRatio(), preset.TIMECODE_COLOR_PRIMARY, preset.TIMECODE_COLOR_SECONDARY)
+        if type == TimecodeType.CLOCK:
+            return self.createElementClock(elemH, frameInfo.getDateTime(), True, preset.TIMECODE_COLOR_PRIMARY, preset.TIMECODE_COLOR_SECONDARY)
+        if type == TimecodeType.CLOCK_NOSECONDS:
+            return self.createElementClock(elemH, frameInfo.getDateTime(), False, preset.TIMECODE_COLOR_PRIMARY, preset.TIMECODE_COLOR_SECONDARY)
+
+        text = self.createText(type, frameInfo)
+        return self.createElementText(text, elemH, preset.TIMECODE_COLOR_PRIMARY, preset.TIMECODE_COLOR_SECONDARY)
+
+    def getBarLayers(self, width, height, colPrimary, colSecondary):
+        key = (width, height, colPrimary, colSecondary)
+        if key not in self._barLayers:
+            self._barLayers[key] = self.createBarLayers(width, height, colPrimary, colSecondary)
+        return self._barLayers[key]
+
+    def createBarLayers(self, width, height, colPrimary, colSecondary):
+        # The empty and the full bar are drawn once, every frame blends between them with a mask of its fill
         offsOuter = int(height * 0.15)
         offsInner = offsOuter * 2
         heightOuter = height - 2 * offsOuter
         heightInner = height - 2 * offsInner
+        maxInnerW = width - 2 * offsInner - heightInner
 
         colFg = ColorHelper.hexToRgba(colPrimary, 0.85)
         colBg = ColorHelper.hexToRgba(colSecondary, 0.5)
 
-        img = Image.new("RGBA", (width, height))
-        draw = ImageDraw.Draw(img, 'RGBA')
+        imgEmpty = Image.new("RGBA", (width, height))
+        draw = ImageDraw.Draw(imgEmpty, 'RGBA')
 
         draw.ellipse((0, 0, height, height), fill=colFg)
         draw.ellipse((width - height, 0, width, height), fill=colFg)
@@ -90,31 +111,97 @@ class TimecodeRenderer:
         draw.ellipse((width - heightOuter - offsOuter, offsOuter, width - offsOuter, offsOuter + heightOuter), fill=colBg)
         draw.rectangle((offsOuter + math.floor(heightOuter / 2), offsOuter, width - offsOuter - math.floor(heightOuter / 2), offsOuter + heightOuter), fill=colBg)
 
-        maxInnerW = width - 2 * offsInner - heightInner
-        ratInnerW = int(ratio * maxInnerW)
+        imgFull = imgEmpty.copy()
+        draw = ImageDraw.Draw(imgFull, 'RGBA')
         draw.ellipse((offsInner, offsInner, offsInner + heightInner, offsInner + heightInner), fill=colFg)
-        if ratInnerW > 0:
-            draw.ellipse((offsInner + ratInnerW, offsInner, offsInner + heightInner + ratInnerW, offsInner + heightInner), fill=colFg)
-            draw.rectangle((offsInner + math.floor(heightInner / 2), offsInner, offsInner + math.floor(heightInner / 2) + ratInnerW, offsInner + heightInner), fill=colFg)
+        draw.ellipse((offsInner + maxInnerW, offsInner, offsInner + heightInner + maxInnerW, offsInner + heightInner), fill=colFg)
+        draw.rectangle((offsInner + math.floor(heightInner / 2), offsInner, offsInner + math.floor(heightInner / 2) + maxInnerW, offsInner + heightInner), fill=colFg)
+
+        imgCap = Image.new("L", (width, height))
+        ImageDraw.Draw(imgCap).ellipse((offsInner, offsInner, offsInner + heightInner, offsInner + heightInner), fill=255)
+
+        bandStart = offsInner + math.floor(heightInner / 2)
+        imgBand = Image.new("L", (width, height))
+        ImageDraw.Draw(imgBand).rectangle((bandStart, offsInner, bandStart + maxInnerW, offsInner + heightInner), fill=255)
+
+        finSize = (width // self.AA_FACTOR, height // self.AA_FACTOR)
+        layers = []
+        for img in (imgEmpty, imgFull, imgCap, imgBand):
+            layers.append(img.resize(finSize, resample=Image.LANCZOS))
+            img.close()
+
+        imgEmpty, imgFull, imgCap, imgBand = layers
+        capBox = imgCap.getbbox()
+        imgCapCropped = imgCap.crop(capBox)
+        imgCap.close()
+
+        return imgEmpty, imgFull, imgCapCropped, capBox[:2], imgBand, bandStart // self.AA_FACTOR, maxInnerW // self.AA_FACTOR
+
+    def createElementBar(self, width, height, ratio, colPrimary, colSecondary):
+        imgEmpty, imgFull, imgCap, capPos, imgBand, bandStart, maxFillW = self.getBarLayers(width, height, colPrimary, colSecondary)
+
+        # The fill is quantized to whole output pixels
+        fillW = round(min(1, max(0, ratio)) * maxFillW)
+
+        mask = Image.new("L", imgEmpty.size)
+        if fillW > 0:
+            with imgBand.crop((0, 0, bandStart + fillW, imgBand.height)) as imgBandFilled:
+                mask.paste(imgBandFilled, (0, 0))
+        mask.paste(255, capPos, imgCap)
+        mask.paste(255, (capPos[0] + fillW, capPos[1]), imgCap)
+
+        img = Image.composite(imgFull, imgEmpty, mask)
+        mask.close()
 
         return img
 
-    def createElementClock(self, height, time, showSeconds, colPrimary, colSecondary):
+    def getClockBackground(self, height, colPrimary, colSecondary):
+        key = (height, colPrimary, colSecondary)
+        if key not in self._clockBackgrounds:
+            img = self.createClockBackground(height, colPrimary, colSecondary)
+            imgSmall = img.resize((height // self.AA_FACTOR, height // self.AA_FACTOR), resample=Image.LANCZOS)
+            self._clockBackgrounds[key] = (img, imgSmall)
+        return self._clockBackgrounds[key]
+
+    def createClockBackground(self, height, colPrimary, colSecondary):
         radius = int(height / 2)
         borderW = int(height * 0.04)
 
         colBorder = ColorHelper.hexToRgba(colPrimary, 0.95)
         colBg = ColorHelper.hexToRgba(colSecondary, 0.5)
         colMarkers = ColorHelper.hexToRgba(colPrimary, 0.2)
-        colHandH = ColorHelper.hexToRgba(colPrimary, 0.85)
-        colHandM = ColorHelper.hexToRgba(colPrimary, 0.7)
-        colHandS = ColorHelper.hexToRgba(colPrimary, 0.6)
-        colDot = ColorHelper.hexToRgba(colPrimary, 0.85)
 
         markerW = int(borderW / 4)
         markerLen = int((radius - borderW) * 0.25)
         markerOffs = int((radius - borderW) * 0.1)
 
+        center_x = int(height / 2)
+        center_y = int(height / 2)
+
+        img = Image.new("RGBA", (height, height))
+        draw = ImageDraw.Draw(img, 'RGBA')
+
+        draw.ellipse([(0, 0), (height, height)], fill=colBg, outline=colBorder, width=borderW)
+
+        for i in range(12):
+            angle = math.radians(360 / 12 * i - 90)
+            x1 = center_x + int(((radius - borderW) - markerLen) * math.cos(angle))
+            y1 = center_y + int(((radius - borderW) - markerLen) * math.sin(angle))
+            x2 = center_x + int(((radius - borderW) - markerOffs) * math.cos(angle))
+            y2 = center_y + int(((radius - borderW) - markerOffs) * math.sin(angle))
+            draw.line([(x1, y1), (x2, y2)], fill=colMarkers, width=markerW)
+
+        return img
+
+    def createElementClock(self, height, time, showSeconds, colPrimary, colSecondary):
+        radius = int(height / 2)
+        borderW = int(height * 0.04)
+
+        colHandH = ColorHelper.hexToRgba(colPrimary, 0.85)
+        colHandM = ColorHelper.hexToRgba(colPrimary, 0.7)
+        colHandS = ColorHelper.hexToRgba(colPrimary, 0.6)
+        colDot = ColorHelper.hexToRgba(colPrimary, 0.85)
+
         handH = int((height - 2 * borderW) * 0.04)
         handM = int((height - 2 * borderW) * 0.04)
         handS = int((height - 2 * borderW) * 0.02)
@@ -130,19 +217,11 @@ class TimecodeRenderer:
         center_x = int(height / 2)
         center_y = int(height / 2)
 
-        img = Image.new("RGBA", (height, height))
+        # Only the hands are drawn per frame, on top of a copy of the cached bezel and markers
+        imgBg, imgBgSmall = self.getClockBackground(height, colPrimary, colSecondary)
+        img = imgBg.copy()
         draw = ImageDraw.Draw(img, 'RGBA')
 
-        draw.ellipse([(0, 0), (height, height)], fill=colBg, outline=colBorder, width=borderW)
-
-        for i in range(12):
-            angle = math.radians(360 / 12 * i - 90)
-            x1 = center_x + int(((radius - borderW) - markerLen) * math.cos(angle))
-            y1 = center_y + int(((radius - borderW) - markerLen) * math.sin(angle))
-            x2 = center_x + int(((radius - borderW) - markerOffs) * math.cos(angle))
-            y2 = center_y + int(((radius - borderW) - markerOffs) * math.sin(angle))
-            draw.line([(x1, y1), (x2, y2)], fill=colMarkers, width=markerW)
-
         hourAngle = (360 / 12) * hour + (360 / (12 * 60)) * minute + (360 / (12 * 60 * 60)) * second
         hourAngleRad = math.radians(hourAngle - 90)
         hourX = center_x + int(radius * lenH * math.cos(hourAngleRad))
@@ -167,7 +246,27 @@ class TimecodeRenderer:
 
         draw.ellipse((center_x - int(handMax / 2), center_y - int(handMax / 2), center_x + int(handMax / 2), center_y + int(handMax / 2)), fill=colDot)
 
-        return img
+        # Only the area around the hands is downscaled, padded by more than the LANCZOS kernel size and aligned to AA_FACTOR
+        handXs = [center_x, hourX, minuteX] + ([secondX] if showSeconds else [])
+        handYs = [center_y, hourY, minuteY] + ([secondY] if showSeconds else [])
+        padding = handMax + 4 * self.AA_FACTOR
+        region = [min(handXs) - padding, min(handYs) - padding, max(handXs) + padding, max(handYs) + padding]
+        region = [max(0, min(height, (v // self.AA_FACTOR + (1 if i >= 2 else 0)) * self.AA_FACTOR)) for i, v in enumerate(region)]
+
+        with img.crop(region) as imgRegion:
+            imgRegionSmall = imgRegion.resize((imgRegion.width // self.AA_FACTOR, imgRegion.height // self.AA_FACTOR), resample=Image.LANCZOS)
+        img.close()
+
+        # The outer pixels of the region were influenced by the crop, they are already correct in the cached background
+        inset = [0 if region[0] == 0 else 4, 0 if region[1] == 0 else 4, 0 if region[2] == height else 4, 0 if region[3] == height else 4]
+        innerBox = (inset[0], inset[1], imgRegionSmall.width - inset[2], imgRegionSmall.height - inset[3])
+
+        imgOut = imgBgSmall.copy()
+        with imgRegionSmall.crop(innerBox) as imgInner:
+            imgOut.paste(imgInner, (region[0] // self.AA_FACTOR + inset[0], region[1] // self.AA_FACTOR + inset[1]))
+        imgRegionSmall.close()
+
+        return imgOut
 
     def createText(self, type, frameInfo):
         pt = frameInfo.getElapsedSeconds()
@@ -200,19 +299,51 @@ class TimecodeRenderer:
 
         return '?'
 
-    def createElementText(self, text, size, colPrimary, colSecondary):
+    def getFont(self, size):
+        if size not in self._fonts:
+            self._fonts[size] = ImageFont.truetype(self._basefolder + '/static/assets/fonts/Inconsolata-Regular.ttf', size)
+        return self._fonts[size]
+
+    def getGlyphAtlas(self, size, colPrimary, colSecondary):
+        key = (size, colPrimary, colSecondary)
+        if key not in self._glyphAtlases:
+            self._glyphAtlases[key] = self.createGlyphAtlas(size, colPrimary, colSecondary)
+        return self._glyphAtlases[key]
+
+    def createGlyphAtlas(self, size, colPrimary, colSecondary):
+        # Every glyph is drawn once on its own background tile and downscaled, Inconsolata is monospaced so the tiles line up
         colFg = ColorHelper.hexToRgba(colPrimary, 0.95)
         colBg = ColorHelper.hexToRgba(colSecondary, 0.5)
 
-        fnt = ImageFont.truetype(self._basefolder + '/static/assets/fonts/Inconsolata-Regular.ttf', size)
+        fnt = self.getFont(size)
         padding = int(size * self.TEXT_PADDING)
-        dummy = Image.new("RGBA", (1, 1))
-        dummyDraw = ImageDraw.Draw(dummy, 'RGBA')
-        textBbox = dummyDraw.textbbox((0, 0), text, font=fnt, anchor='la')
-        bbox = (textBbox[0], textBbox[1], textBbox[2] + 2 * padding, textBbox[3] + 2 * padding)
-        dummy.close()
-        img = Image.new("RGBA", (bbox[2], bbox[3]))
-        draw = ImageDraw.Draw(img, 'RGBA')
-        draw.rectangle(bbox, fill=colBg)
-        draw.text((padding, padding), text, font=fnt, fill=colFg, anchor='la')
+        textBottom = max(fnt.getbbox(c, anchor='la')[3] for c in self.TEXT_CHARSET)
+
+        cellW = math.ceil(fnt.getlength('0') / self.AA_FACTOR) * self.AA_FACTOR
+        cellH = math.ceil((textBottom + 2 * padding) / self.AA_FACTOR) * self.AA_FACTOR
+        finH = cellH // self.AA_FACTOR
+
+        glyphs = {}
+        for c in self.TEXT_CHARSET:
+            tile = Image.new("RGBA", (cellW, cellH))
+            draw = ImageDraw.Draw(tile, 'RGBA')
+            draw.rectangle((0, 0, cellW, cellH), fill=colBg)
+            draw.text((0, padding), c, font=fnt, fill=colFg, anchor='la')
+            glyphs[c] = tile.resize((cellW // self.AA_FACTOR, finH), resample=Image.LANCZOS)
+            tile.close()
+
+        paddingTile = Image.new("RGBA", (max(1, round(padding / self.AA_FACTOR)), finH))
+        ImageDraw.Draw(paddingTile, 'RGBA').rectangle((0, 0, paddingTile.width, finH), fill=colBg)
+
+        return glyphs, paddingTile
+
+    def createElementText(self, text, size, colPrimary, colSecondary):
+        glyphs, paddingTile = self.getGlyphAtlas(size, colPrimary, colSecondary)
+        tiles = [paddingTile] + [glyphs.get(c, glyphs['?']) for c in text] + [paddingTile]
+
+        img = Image.new("RGBA", (sum(t.width for t in tiles), paddingTile.height))
+        x = 0
+        for t in tiles:
+            img.paste(t, (x, 0))
+            x += t.width
         return img
@@ -0,0 +1,95 @@
+import io
+import json
+import mmap
+import struct
+import zipfile
+from threading import Lock
+
+from PIL import Image
+
+from .fileHelper import FileHelper
+from .stageUsage import StageUsage
+
+
+class ZipFrameSource:
+    LOCAL_HEADER_SIZE = 30
+
+    def __init__(self, path):
+        self.PATH = path
+        self.FRAMES = []
+        self.METADATA = None
+
+        # Offset and size of every uncompressed member, so it can be sliced directly from the mapped archive
+        self.STORED_OFFSETS = {}
+
+        self._lock = Lock()
+        self._zip = None
+        self._file = None
+        self._mmap = None
+
+        self.readIndex()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_lock'] = None
+        state['_zip'] = None
+        state['_file'] = None
+        state['_mmap'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = Lock()
+
+    def readIndex(self):
+        with zipfile.ZipFile(self.PATH, 'r') as zipFile:
+            infos = [x for x in zipFile.infolist() if '/' not in x.filename]
+            self.FRAMES = sorted(x.filename for x in infos if x.filename.endswith('.jpg'))
+
+            if FileHelper.METADATA_FILE_NAME in zipFile.namelist():
+                self.METADATA = json.loads(zipFile.read(FileHelper.METADATA_FILE_NAME))
+
+        with open(self.PATH, 'rb') as f:
+            for info in infos:
+                if info.compress_type != zipfile.ZIP_STORED or info.flag_bits & 0x1:
+                    continue
+
+                f.seek(info.header_offset)
+                header = f.read(self.LOCAL_HEADER_SIZE)
+                nameLength, extraLength = struct.unpack('<HH', header[26:30])
+                offset = info.header_offset + self.LOCAL_HEADER_SIZE + nameLength + extraLength
+                self.STORED_OFFSETS[info.filename] = (offset, info.file_size)
+
+    def openArchive(self):
+        with self._lock:
+            if self._zip is None:
+                self._zip = zipfile.ZipFile(self.PATH, 'r')
+            if self._mmap is None and len(self.STORED_OFFSETS) > 0:
+                self._file = open(self.PATH, 'rb')
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, frame):
+        self.openArchive()
+
+        if frame in self.STORED_OFFSETS:
+            offset, size = self.STORED_OFFSETS[frame]
+            StageUsage.countRead(size)
+            return self._mmap[offset:offset + size]
+
+        StageUsage.countRead(self._zip.getinfo(frame).compress_size)
+        return self._zip.read(frame)
+
+    def open(self, frame):
+        return Image.open(io.BytesIO(self.read(frame)))
+
+    def close(self):
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._zip is not None:
+                self._zip.close()
+                self._zip = None
@@ -5,3 +5,5 @@ class CombineMethod(Enum):
     DROP = 1
     BLEND = 2
     BLEND_WEIGHTED = 3
+    MEDIAN = 4
+    TRIMMED_MEAN = 5
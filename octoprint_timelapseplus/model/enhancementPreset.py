@@ -14,6 +14,8 @@ class EnhancementPreset:
         self.BRIGHTNESS = 1
         self.CONTRAST = 1
         self.NORMALIZE = False
+        self.DEFLICKER = False
+        self.DEFLICKER_WINDOW = 15
 
         self.BLUR = False
         self.BLUR_RADIUS = 30
@@ -27,9 +29,24 @@ class EnhancementPreset:
         self.TIMECODE_COLOR_PRIMARY = '#FFFFFF'
         self.TIMECODE_COLOR_SECONDARY = '#000000'
 
+        self._blurMasks = {}
+
         if d is not None:
             self.setJSON(parent, d)
 
+    def getBlurMask(self, size):
+        # The mask is only loaded and resized once per frame size, together with the bounding box of its masked area
+        if size not in self._blurMasks:
+            imgMask = Image.open(self.BLUR_MASK.PATH).convert('L')
+            if imgMask.size != size:
+                imgMaskResized = imgMask.resize(size, resample=Image.LANCZOS)
+                imgMask.close()
+                imgMask = imgMaskResized
+
+            self._blurMasks[size] = (imgMask, imgMask.getbbox())
+
+        return self._blurMasks[size]
+
     def applyBlur(self, img):
         if not self.BLUR:
             return img
@@ -37,15 +54,31 @@ class EnhancementPreset:
         if self.BLUR_MASK is None:
             raise Exception('Blur Mask is not set')
 
-        imgMask = Image.open(self.BLUR_MASK.PATH).convert('L')
-        if img.width != imgMask.width or img.height != imgMask.height:
-            imgMask = imgMask.resize((img.width, img.height), resample=Image.LANCZOS)
+        imgMask, bbox = self.getBlurMask(img.size)
+        if bbox is None:
+            return img
+
+        # Only the masked area is blurred, padded so pixels around it still contribute to the blur
+        padding = self.BLUR_RADIUS * 3
+        region = (
+            max(0, bbox[0] - padding),
+            max(0, bbox[1] - padding),
+            min(img.width, bbox[2] + padding),
+            min(img.height, bbox[3] + padding)
+        )
+        offset = (bbox[0] - region[0], bbox[1] - region[1], bbox[2] - region[0], bbox[3] - region[1])
+
+        with img.crop(region) as imgRegion:
+            imgBlurred = imgRegion.filter(ImageFilter.GaussianBlur(self.BLUR_RADIUS))
+        imgBlurredArea = imgBlurred.crop(offset)
+        imgMaskArea = imgMask.crop(bbox)
 
-        imgBlurred = img.filter(ImageFilter.GaussianBlur(self.BLUR_RADIUS))
-        imgOut = Image.composite(imgBlurred, img, imgMask)
+        imgOut = img.copy()
+        imgOut.paste(imgBlurredArea, bbox[:2], imgMaskArea)
 
         imgBlurred.close()
-        imgMask.close()
+        imgBlurredArea.close()
+        imgMaskArea.close()
 
         return imgOut
 
@@ -70,6 +103,8 @@ class EnhancementPreset:
     def setJSON(self, parent, d):
         if 'name' in d: self.NAME = d['name']
         if 'normalize' in d: self.NORMALIZE = d['normalize']
+        if 'deflicker' in d: self.DEFLICKER = d['deflicker']
+        if 'deflickerWindow' in d: self.DEFLICKER_WINDOW = max(1, int(d['deflickerWindow']))
         if 'enhance' in d: self.ENHANCE = d['enhance']
         if 'equalize' in d: self.EQUALIZE = d['equalize']
         if 'brightness' in d: self.BRIGHTNESS = float(d['brightness'])
@@ -95,6 +130,8 @@ class EnhancementPreset:
         d = dict(
             name=self.NAME,
             normalize=self.NORMALIZE,
+            deflicker=self.DEFLICKER,
+            deflickerWindow=self.DEFLICKER_WINDOW,
             enhance=self.ENHANCE,
             equalize=self.EQUALIZE,
             brightness=self.BRIGHTNESS,
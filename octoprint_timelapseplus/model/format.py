@@ -1,4 +1,6 @@
 class Format:
+    MUXER_ARGS = ['-movflags']
+
     def __init__(self, id, name, title, extension, mimeType, codecName, codecId, additionalArgs=dict(), createPalette=False):
         self.ID = id
         self.NAME = name
@@ -41,6 +43,16 @@ class Format:
 
         return self.CODEC_ID
 
+    def getMuxerArgs(self):
+        # Options of the container, which still apply when the encoded streams are only copied
+        ret = []
+
+        for k in self.MUXER_ARGS:
+            if k in self.ADDITIONAL_ARGS:
+                ret += [k, str(self.ADDITIONAL_ARGS[k])]
+
+        return ret
+
     def getRenderArgs(self):
         ret = []
 
@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class IntermediateFormat(Enum):
+    JPEG = 1
+    PNG = 2
+    RAW = 3
@@ -1,34 +1,71 @@
+import concurrent.futures
 import glob
+import hashlib
 import json
 import os
 import re
 import shutil
+import signal
 import subprocess
 import time
-import zipfile
 from datetime import datetime
-from threading import Thread
+from math import ceil, gcd
+from threading import Event, Lock, Thread
 
-from PIL import Image, ImageEnhance
+from PIL import Image
 
 from .enhancementPreset import EnhancementPreset
-from .frameTimecodeInfo import FrameTimecodeInfo
+from .frameZip import FrameZip
+from .intermediateFormat import IntermediateFormat
 from .ppRollPhase import PPRollPhase
 from .renderJobState import RenderJobState
 from .renderPreset import RenderPreset
-from ..helpers.colorHelper import ColorHelper
+from ..helpers.cpuHelper import CpuHelper
 from ..helpers.fileHelper import FileHelper
+from ..helpers.filtergraphBuilder import FiltergraphBuilder
 from ..helpers.formatHelper import FormatHelper
-from ..helpers.imageCombineHelper import ImageCombineHelper
+from ..helpers.frameProcessor import FrameProcessor
+from ..helpers.frameStore import FrameStore
 from ..helpers.jobExecutor import JobExecutor
 from ..helpers.listHelper import ListHelper
-from ..helpers.ppRollRenderer import PPRollRenderer
-from ..helpers.timecodeRenderer import TimecodeRenderer
+from ..helpers.renderStats import RenderStats
+from ..helpers.stageUsage import StageUsage
+from ..helpers.zipFrameSource import ZipFrameSource
 from ..log import Log
 
 
 class RenderJob:
-    def __init__(self, baseFolder, frameZip, parent, settings, dataFolder, enhancementPreset=None, renderPreset=None, videoFormat=None):
+    # Palettes of GIFs whose decoded frames would need more memory are created in a separate pass
+    PALETTE_SINGLE_PASS_MAX_BYTES = 256 * 1024 * 1024
+
+    # Number of frames a separately created palette is generated from
+    PALETTE_SAMPLE_FRAMES = 100
+
+    # Keyframe interval of segmented encodes, segments always contain whole GOPs
+    SEGMENT_GOP_SECONDS = 2
+
+    # Source frames read on both sides of a parallel interpolation window, so its borders are interpolated like in a single pass
+    INTERPOLATE_WINDOW_OVERLAP = 8
+
+    # Smallest number of source frames a parallel interpolation window is worth its overhead for
+    INTERPOLATE_WINDOW_MIN_FRAMES = 50
+
+    # Increase whenever the intermediate frames or the manifest change, so older render folders aren't resumed
+    MANIFEST_VERSION = 1
+
+    # FFmpeg always runs with a lower priority than OctoPrint, and with the lowest one while a print is capturing
+    FFMPEG_NICENESS = 10
+    FFMPEG_THROTTLED_NICENESS = 19
+
+    # Previews use every Nth frame of the Frame Collection unless the request sets its own step
+    PREVIEW_FRAME_STEP = 10
+
+    # Previews are decoded and encoded at most at this height
+    PREVIEW_MAX_HEIGHT = 480
+
+    PREVIEW_VIDEO_FORMAT_ID = 'mp4-h264-prevq'
+
+    def __init__(self, baseFolder, frameZip, parent, settings, dataFolder, enhancementPreset=None, renderPreset=None, videoFormat=None, manifest=None, previewFrameStep=0):
         self.ID = parent.getRandomString(8)
         self.PARENT = parent
         self._settings = settings
@@ -36,17 +73,37 @@ class RenderJob:
 
         self.FRAMEZIP = frameZip
         self.METADATA = None
+        self.FRAMES = []
+        self.FRAME_SOURCE = None
+        self.FRAME_STORE = None
+        self.FRAME_PROCESSOR = None
+        self.STREAM_FRAMES = False
+        self.FILTERGRAPH = False
+        self.ANALYZED_VALUES = None
+        self.ENCODE_FRAMES = None
+        self.COMPLETED_STAGES = []
+        self.PREVIEW_FRAME_STEP = previewFrameStep
+        self.PREVIEW_FOLDER = RenderJob.getPreviewFolder(dataFolder)
 
         self.BASE_NAME = os.path.splitext(os.path.basename(frameZip.PATH))[0]
         self.FOLDER = ''
         self.FOLDER_NAME = ''
         self.RUNNING = False
+        self.PAUSED = False
+        self.SCHEDULER = None
         self.THREAD = None
         self.PROGRESS = 0
         self.ERROR = None
 
         self.ETA = 0
         self._lastEtaStart = 0
+        self._stateChanges = 0
+
+        self.STATS = RenderStats(dataFolder)
+        self.RESOLUTION = None
+        self.CURRENT_STAGE = None
+        self.STAGE_USAGE = None
+        self.EXPECTED_FRAMES_PER_SECOND = {}
 
         self.ENHANCEMENT_PRESET = enhancementPreset
         self.RENDER_PRESET = renderPreset
@@ -66,7 +123,16 @@ class RenderJob:
             defaultFormatId = self._settings.get(["defaultVideoFormat"])
             self.VIDEO_FORMAT = FormatHelper.getVideoFormatById(defaultFormatId)
 
-        self.createFolder(dataFolder)
+        if self.isPreview():
+            # The preset is copied, so the caller's preset keeps its interpolation
+            self.RENDER_PRESET = RenderPreset(self.RENDER_PRESET.getJSON())
+            self.RENDER_PRESET.INTERPOLATE = False
+            self.VIDEO_FORMAT = FormatHelper.getVideoFormatById(self.PREVIEW_VIDEO_FORMAT_ID)
+
+        if manifest is None:
+            self.createFolder(dataFolder)
+        else:
+            self.restoreManifest(dataFolder, manifest)
 
         self.STATE = None
         self.setState(RenderJobState.WAITING)
@@ -74,6 +140,7 @@ class RenderJob:
     def setState(self, state):
         Log.debug('Render Job State changed to ' + state.name, {'id', self.ID})
         self.STATE = state
+        self._stateChanges += 1
         self.PROGRESS = 0
         self.ETA = 0
         self._lastEtaStart = round(time.time() * 1000)
@@ -95,12 +162,30 @@ class RenderJob:
             name=self.BASE_NAME,
             state=self.STATE.name,
             running=self.RUNNING,
+            paused=self.PAUSED,
             progress=self.PROGRESS * 100,
-            eta=self.ETA,
+            eta=self.getEta(),
+            preview=self.isPreview(),
             enhancementPresetName=self.ENHANCEMENT_PRESET.NAME,
             renderPresetName=self.RENDER_PRESET.NAME
         )
 
+    def isPreview(self):
+        return self.PREVIEW_FRAME_STEP > 0
+
+    @staticmethod
+    def getPreviewFolder(dataFolder):
+        return dataFolder + '/preview'
+
+    def isThrottled(self):
+        return self.SCHEDULER is not None and self.SCHEDULER.isThrottled()
+
+    def getAllowedWorkers(self, numWorkers):
+        if self.SCHEDULER is None:
+            return numWorkers
+
+        return self.SCHEDULER.getAllowedWorkers(self, numWorkers)
+
     def start(self):
         self.RUNNING = True
         self.THREAD = Thread(target=self.startPipeline, daemon=True)
@@ -111,344 +196,722 @@ class RenderJob:
         self.FOLDER = dataFolder + '/render/' + self.FOLDER_NAME
         os.makedirs(os.path.dirname(os.path.abspath(self.FOLDER)), exist_ok=True)
 
-    def extractZip(self):
-        self.setState(RenderJobState.EXTRACTING)
-        with zipfile.ZipFile(self.FRAMEZIP.PATH, "r") as zip_ref:
-            zip_ref.extractall(self.FOLDER)
-
-        metadataFile = self.FOLDER + '/' + FileHelper.METADATA_FILE_NAME
-        if os.path.isfile(metadataFile):
-            with open(metadataFile, 'r') as mdFile:
-                self.METADATA = json.load(mdFile)
-
-    def combineImages(self, preset):
-        if not preset.COMBINE:
-            return
-
-        self.setState(RenderJobState.COMBINING)
-
-        frameFiles = sorted(glob.glob(self.FOLDER + '/[!PPROLL]*.jpg'))
-        chunks = ListHelper.chunkList(frameFiles, preset.COMBINE_SIZE)
+        intermediateFormat = IntermediateFormat[self._settings.get(["renderIntermediateFormat"])]
+        self.FRAME_STORE = FrameStore(self.FOLDER, intermediateFormat)
+        self.FILTERGRAPH = self.canUseFiltergraph()
+        self.STREAM_FRAMES = self.canStreamFrames()
 
-        jobs = [(chunk, preset, i) for i, chunk in enumerate(chunks)]
-        JobExecutor(self._settings, jobs, self.combineImagesInner, self.setProgress).start()
+    def getPresetHash(self, enhancementPresetJson, renderPresetJson, videoFormatId):
+        c = json.dumps([enhancementPresetJson, renderPresetJson, videoFormatId], sort_keys=True)
+        return hashlib.md5(c.encode('utf-8')).hexdigest()
 
-    def combineImagesInner(self, j):
-        chunk, preset, i = j
-        img = ImageCombineHelper.createCombinedImage(chunk, preset.COMBINE_METHOD)
-        imgName = "C_{:05d}".format(i + 1) + ".jpg"
-        imgPath = self.FOLDER + '/' + imgName
-        img.save(imgPath, quality=100, subsampling=0)
-        img.close()
+    def getManifest(self):
+        epJson = self.ENHANCEMENT_PRESET.getJSON()
+        rpJson = self.RENDER_PRESET.getJSON()
 
-        for f in chunk:
-            os.remove(f)
-
-        if self.METADATA is not None:
-            self.METADATA['timestamps'][imgName] = self.METADATA['timestamps'][os.path.basename(chunk[-1])]
+        return dict(
+            version=self.MANIFEST_VERSION,
+            pluginVersion=self.PARENT.getPluginVersion(),
+            id=self.ID,
+            folderName=self.FOLDER_NAME,
+            frameZip=self.FRAMEZIP.PATH,
+            enhancementPreset=epJson,
+            renderPreset=rpJson,
+            videoFormat=self.VIDEO_FORMAT.ID,
+            intermediateFormat=self.FRAME_STORE.FORMAT.name,
+            streamFrames=self.STREAM_FRAMES,
+            filtergraph=self.FILTERGRAPH,
+            frames=self.FRAMES,
+            analyzedValues=self.ANALYZED_VALUES,
+            encodeFrames=self.ENCODE_FRAMES,
+            completedStages=self.COMPLETED_STAGES
+        )
 
-    def blurImages(self, preset):
-        if not preset.BLUR:
+    def saveManifest(self):
+        # Previews are quick to render again, so they are never resumed
+        if self.isPreview():
             return
 
-        self.setState(RenderJobState.BLURRING)
+        manifestFile = self.FOLDER + '/' + FileHelper.RENDER_MANIFEST_FILE_NAME
+        tmpFile = manifestFile + '.tmp'
+        with open(tmpFile, 'w') as f:
+            json.dump(self.getManifest(), f)
+        os.replace(tmpFile, manifestFile)
 
-        frameFiles = sorted(glob.glob(self.FOLDER + '/*.jpg'))
+    def restoreManifest(self, dataFolder, manifest):
+        self.ID = manifest['id']
+        self.FOLDER_NAME = manifest['folderName']
+        self.FOLDER = dataFolder + '/render/' + self.FOLDER_NAME
+        self.FRAME_STORE = FrameStore(self.FOLDER, IntermediateFormat[manifest['intermediateFormat']])
+        self.STREAM_FRAMES = manifest['streamFrames']
+        self.FILTERGRAPH = manifest['filtergraph']
+        self.FRAMES = manifest['frames']
+        self.ANALYZED_VALUES = manifest['analyzedValues']
+        self.ENCODE_FRAMES = manifest['encodeFrames']
+        self.COMPLETED_STAGES = manifest['completedStages']
+
+    @staticmethod
+    def listResumableFolders(dataFolder):
+        folders = glob.glob(dataFolder + '/render/*')
+        return [f for f in folders if os.path.isfile(f + '/' + FileHelper.RENDER_MANIFEST_FILE_NAME)]
+
+    @staticmethod
+    def fromManifest(baseFolder, folder, parent, settings, dataFolder):
+        with open(folder + '/' + FileHelper.RENDER_MANIFEST_FILE_NAME, 'r') as f:
+            manifest = json.load(f)
+
+        # Intermediate frames of another plugin version may have been rendered differently, the Render Job starts over instead
+        if manifest.get('version') != RenderJob.MANIFEST_VERSION or manifest.get('pluginVersion') != parent.getPluginVersion():
+            Log.info('Discarding Render Job of another Plugin Version', {'folder': folder, 'version': manifest.get('version'), 'pluginVersion': manifest.get('pluginVersion')})
+            shutil.rmtree(folder, ignore_errors=True)
+            return None
+
+        frameZip = FrameZip(manifest['frameZip'], parent)
+        enhancementPreset = EnhancementPreset(parent, manifest['enhancementPreset'])
+        renderPreset = RenderPreset(manifest['renderPreset'])
+        videoFormat = FormatHelper.getVideoFormatById(manifest['videoFormat'])
+
+        return RenderJob(baseFolder, frameZip, parent, settings, dataFolder, enhancementPreset, renderPreset, videoFormat, manifest)
+
+    def getStages(self):
+        stages = [
+            ('analyzeImages', self.analyzeImages, self.ENHANCEMENT_PRESET),
+            ('createPPRoll', self.createPPRoll, self.RENDER_PRESET)
+        ]
+
+        if self.FILTERGRAPH:
+            stages.append(('encodeFiltergraph', self.encodeFiltergraph, self.RENDER_PRESET))
+        elif self.STREAM_FRAMES:
+            stages.append(('encodeStream', self.encodeStream, self.RENDER_PRESET))
+        else:
+            stages.append(('processFrames', self.processFrames, self.RENDER_PRESET))
+            stages.append(('interpolate', self.interpolate, self.RENDER_PRESET))
+            stages.append(('prepareEncodeFrames', self.prepareEncodeFrames, self.RENDER_PRESET))
+            stages.append(('createPalette', self.createPalette, self.VIDEO_FORMAT))
+            stages.append(('encode', self.encode, self.RENDER_PRESET))
+
+        return stages
+
+    def getStatsKey(self):
+        epJson = self.ENHANCEMENT_PRESET.getJSON()
+        rpJson = self.RENDER_PRESET.getJSON()
+        return self.getPresetHash(epJson, rpJson, self.VIDEO_FORMAT.ID), self.RESOLUTION
+
+    def loadExpectedThroughput(self):
+        presetHash, resolution = self.getStatsKey()
+        for name, fn, arg in self.getStages():
+            fps = self.STATS.getFramesPerSecond(presetHash, resolution, name)
+            if fps is not None and fps > 0:
+                self.EXPECTED_FRAMES_PER_SECOND[name] = fps
+
+    def getEta(self):
+        # The running stage is extrapolated from its progress as long as there is any, all stages after it are
+        # expected to be as fast as they were in the last renders with the same presets and resolution
+        if self.CURRENT_STAGE is None:
+            return self.ETA
+
+        eta = self.ETA
+        numFrames = len(self.FRAMES)
+        currentFps = self.EXPECTED_FRAMES_PER_SECOND.get(self.CURRENT_STAGE)
+        if self.PROGRESS == 0 and currentFps is not None:
+            elapsedMillis = round(time.time() * 1000) - self._lastEtaStart
+            eta = max(0, numFrames / currentFps * 1000 - elapsedMillis)
+
+        names = [name for name, fn, arg in self.getStages()]
+        for name in names[names.index(self.CURRENT_STAGE) + 1:]:
+            fps = self.EXPECTED_FRAMES_PER_SECOND.get(name)
+            if fps is not None and name not in self.COMPLETED_STAGES:
+                eta += numFrames / fps * 1000
+
+        return eta
+
+    def runStage(self, name, fn, *args):
+        if name in self.COMPLETED_STAGES:
+            Log.debug('Skipping completed Render Stage ' + name, {'id': self.ID})
+            return
 
-        jobs = [(frame, preset) for frame in frameFiles]
-        JobExecutor(self._settings, jobs, self.blurImagesInner, self.setProgress).start()
+        # Stages that run FFmpeg can't be throttled on their own, so they wait here until the print allows it
+        self.getAllowedWorkers(1)
 
-    def blurImagesInner(self, j):
-        frame, preset = j
-        img = Image.open(frame)
-        imgRes = preset.applyBlur(img)
-        imgRes.save(frame, quality=100, subsampling=0)
-        imgRes.close()
+        self.CURRENT_STAGE = name
+        stateChanges = self._stateChanges
 
-    def enhanceImages(self, preset):
-        if not preset.ENHANCE:
-            return
+        # Worker jobs and FFmpeg runs add their own usage while the stage runs
+        self.STAGE_USAGE = StageUsage()
+        self.STAGE_USAGE.start()
+        try:
+            self.STAGE_USAGE.runInThread(fn, *args)
+        finally:
+            self.STAGE_USAGE.stop()
 
-        self.setState(RenderJobState.ENHANCING)
-        frameFiles = sorted(glob.glob(self.FOLDER + '/*.jpg'))
+        # Stages return without changing the state when the presets don't need them, those aren't recorded
+        if self._stateChanges > stateChanges:
+            self.finishStage(name, self.STAGE_USAGE)
 
-        jobs = [(frame, preset) for frame in frameFiles]
-        JobExecutor(self._settings, jobs, self.enhanceImagesInner, self.setProgress).start()
+        self.COMPLETED_STAGES.append(name)
+        self.saveManifest()
 
-    def analyzeBrightnessAndContrast(self, image):
-        grayscaleImage = image.convert('L')
-        histogram = grayscaleImage.histogram()
-        pixels = sum(histogram)
-        brightness = sum(i * histogram[i] for i in range(256)) / pixels
-        contrast = (sum((i - brightness) ** 2 * histogram[i] for i in range(256)) / pixels) ** 0.5
-        grayscaleImage.close()
-        return brightness, contrast
+    def finishStage(self, name, usage):
+        # Throughput is recorded in source frames per second, so stages can be compared and summed up
+        presetHash, resolution = self.getStatsKey()
+        self.STATS.addStage(presetHash, resolution, name, len(self.FRAMES), usage)
 
-    def normalizeImages(self, preset):
-        if not preset.NORMALIZE:
+    def openFrameZip(self):
+        self.setState(RenderJobState.EXTRACTING)
+        os.makedirs(self.FOLDER, exist_ok=True)
+
+        self.FRAME_SOURCE = ZipFrameSource(self.FRAMEZIP.PATH)
+        self.METADATA = self.FRAME_SOURCE.METADATA
+
+        if len(self.COMPLETED_STAGES) > 0 and self.FRAMES != self.FRAME_SOURCE.FRAMES:
+            Log.warning('Frame Collection has changed, restarting the Render Job from the beginning', {'id': self.ID})
+            self.ANALYZED_VALUES = None
+            self.ENCODE_FRAMES = None
+            self.COMPLETED_STAGES = []
+
+        self.FRAMES = self.FRAME_SOURCE.FRAMES
+        if self.isPreview():
+            self.FRAMES = self.FRAMES[::self.PREVIEW_FRAME_STEP]
+        self.saveManifest()
+
+        if len(self.FRAMES) > 0:
+            with self.FRAME_SOURCE.open(self.FRAMES[0]) as img:
+                self.RESOLUTION = str(img.width) + 'x' + str(img.height)
+                if self.isPreview():
+                    self.setPreviewSize(img.size)
+
+    def setPreviewSize(self, frameSize):
+        # Resizing lets the Frame Processor decode the JPEGs in draft mode at a fraction of their size
+        preset = self.RENDER_PRESET
+        width, height = (preset.RESIZE_W, preset.RESIZE_H) if preset.RESIZE else frameSize
+        scale = min(1, self.PREVIEW_MAX_HEIGHT / height)
+
+        # H.264 in yuv420p needs even dimensions
+        preset.RESIZE = True
+        preset.RESIZE_W = max(2, int(width * scale / 2) * 2)
+        preset.RESIZE_H = max(2, int(height * scale / 2) * 2)
+
+    def analyzeImages(self, preset):
+        if not preset.NORMALIZE and not preset.DEFLICKER:
             return
 
         self.setState(RenderJobState.ANALYZING)
-        frameFiles = sorted(glob.glob(self.FOLDER + '/*.jpg'))
 
-        analyzedValues = {}
-        jobs = [(frame, preset, analyzedValues) for frame in frameFiles]
-        JobExecutor(self._settings, jobs, self.analyzeImagesInner, self.setProgress).start()
+        results = JobExecutor(self._settings, self.FRAMES, self.FRAME_PROCESSOR.analyzeFrame, self.setProgress, True, self.getAllowedWorkers, self.STAGE_USAGE).start()
+        self.ANALYZED_VALUES = dict(zip(self.FRAMES, results))
+        self.FRAME_PROCESSOR.setAnalyzedValues(self.ANALYZED_VALUES)
 
-        self.setState(RenderJobState.NORMALIZING)
+    def setupFrameProcessor(self):
+        addTimecodes = self.ENHANCEMENT_PRESET.TIMECODE
+        if addTimecodes and self.METADATA is None:
+            self.PARENT.sendClientPopup('warning', 'No Timecode Data', 'The Frame Collection doesn\'t contain any Metadata. Timecode Genreation will be skipped.')
+            addTimecodes = False
 
-        targetBrightness = sum(analyzedValues[k][0] for k in analyzedValues.keys()) / len(analyzedValues.keys())
-        targetContrast = sum(analyzedValues[k][1] for k in analyzedValues.keys()) / len(analyzedValues.keys())
+        self.FRAME_PROCESSOR = FrameProcessor(self._basefolder, self.FRAME_SOURCE, self.FRAME_STORE, self.ENHANCEMENT_PRESET, self.RENDER_PRESET, self.METADATA)
+        self.FRAME_PROCESSOR.setup(addTimecodes)
 
-        jobs = [(frame, preset, analyzedValues[frame], targetBrightness, targetContrast) for frame in frameFiles]
-        JobExecutor(self._settings, jobs, self.normalizeImagesInner, self.setProgress).start()
+        if self.ANALYZED_VALUES is not None:
+            self.FRAME_PROCESSOR.setAnalyzedValues(self.ANALYZED_VALUES)
 
-    def normalizeImagesInner(self, j):
-        frame, preset, frameValues, targetBrightness, targetContrast = j
+    def processFrames(self, preset):
+        self.setState(RenderJobState.PROCESSING)
 
-        img = Image.open(frame)
+        chunkSize = preset.COMBINE_SIZE if preset.COMBINE else 1
+        chunks = ListHelper.chunkList(self.FRAMES, chunkSize)
 
-        frameBrightness = frameValues[0]
+        jobs = [(chunk, self.FOLDER + '/' + f) for chunk, f in zip(chunks, self.getProcessedFrameNames(preset))]
+        JobExecutor(self._settings, jobs, self.FRAME_PROCESSOR.processChunk, self.setProgress, True, self.getAllowedWorkers, self.STAGE_USAGE).start()
 
-        factorBrightness = targetBrightness / frameBrightness
-        enhancerBrightness = ImageEnhance.Brightness(img)
-        imgRes1 = enhancerBrightness.enhance(factorBrightness)
+    def createPPRoll(self, preset):
+        if not preset.PPROLL:
+            return
 
-        frameContrast = self.analyzeBrightnessAndContrast(imgRes1)[1]
-        enhancerContrast = ImageEnhance.Contrast(imgRes1)
-        factorContrast = targetContrast / frameContrast
-        imgRes2 = enhancerContrast.enhance(factorContrast)
+        self.setState(RenderJobState.GENERATING_PPROLL)
+        numFramesPre = preset.getNumPPRollFramesPre()
+        numFramesPost = preset.getNumPPRollFramesPost()
 
-        imgRes2.save(frame, quality=100, subsampling=0)
-        img.close()
-        imgRes1.close()
-        imgRes2.close()
+        jobs = []
+        for i, f in enumerate(self.getPPRollFrameNames('PPROLL_PRE_', numFramesPre)):
+            thisRatio = (i + 1) / numFramesPre
+            jobs.append((thisRatio, self.FRAMES, self.FOLDER + '/' + f, PPRollPhase.PRE))
 
-    def analyzeImagesInner(self, j):
-        frame, preset, analyzedValues = j
-        img = Image.open(frame)
+        for i, f in enumerate(self.getPPRollFrameNames('PPROLL_POST_', numFramesPost)):
+            thisRatio = (i + 1) / numFramesPost
+            jobs.append((thisRatio, self.FRAMES, self.FOLDER + '/' + f, PPRollPhase.POST))
 
-        brightness, contrast = self.analyzeBrightnessAndContrast(img)
-        analyzedValues[frame] = (brightness, contrast)
-        img.close()
+        JobExecutor(self._settings, jobs, self.FRAME_PROCESSOR.renderPPRollFrame, self.setProgress, False, self.getAllowedWorkers, self.STAGE_USAGE).start()
 
-    def enhanceImagesInner(self, j):
-        frame, preset = j
-        img = Image.open(frame)
-        imgRes = preset.applyEnhance(img)
-        imgRes.save(frame, quality=100, subsampling=0)
-        imgRes.close()
+    def getFadeFrameCounts(self, preset, numFrames):
+        if not preset.FADE:
+            return 0, 0
 
-    def resizeImages(self, preset):
-        if not preset.RESIZE:
-            return
+        fadeInFrameCount = min(numFrames, int(preset.FADE_IN_DURATION / 1000 * preset.getFinalFramerate()))
+        fadeOutFrameCount = min(numFrames, int(preset.FADE_OUT_DURATION / 1000 * preset.getFinalFramerate()))
+        return fadeInFrameCount, fadeOutFrameCount
 
-        self.setState(RenderJobState.RESIZING)
-        frameFiles = sorted(glob.glob(self.FOLDER + '/*.jpg'))
+    def canCreatePaletteWhileEncoding(self):
+        # A single FFmpeg pass has to hold every decoded frame in memory until the palette is known
+        with Image.open(self.FOLDER + '/' + self.ENCODE_FRAMES[0]) as img:
+            frameBytes = img.width * img.height * 3
+        return frameBytes * len(self.ENCODE_FRAMES) <= self.PALETTE_SINGLE_PASS_MAX_BYTES
 
-        jobs = [(frame, preset) for frame in frameFiles]
-        JobExecutor(self._settings, jobs, self.resizeImagesInner, self.setProgress).start()
+    def createPalette(self, format):
+        if not format.CREATE_PALETTE or self.canCreatePaletteWhileEncoding():
+            return
 
-    def resizeImagesInner(self, j):
-        frame, preset = j
-        img = Image.open(frame)
-        imgRes = preset.applyResize(img)
-        imgRes.save(frame, quality=100, subsampling=0)
-        imgRes.close()
+        self.setState(RenderJobState.CREATE_PALETTE)
 
-    def addTimecodes(self, preset):
-        if not preset.TIMECODE:
+        # The palette of a long GIF is generated from evenly spaced frames only
+        numFrames = len(self.ENCODE_FRAMES)
+        step = max(1, numFrames // self.PALETTE_SAMPLE_FRAMES)
+        frameData = self.readEncodeFrames(self.ENCODE_FRAMES[::step])
+
+        # The sampled frames keep the timestamps they have in the video, so the fades darken them exactly like in the single pass
+        preset = self.RENDER_PRESET
+        framerate = preset.getFinalFramerate()
+        fadeInFrames, fadeOutFrames = self.getFadeFrameCounts(preset, numFrames)
+        filters = FiltergraphBuilder.buildSegmentFadeFilters(preset.FADE_COLOR, framerate, numFrames, fadeInFrames, fadeOutFrames, 0)
+
+        cmd = self.FRAME_STORE.getFfmpegInputArgs() + ['-framerate', str(framerate) + '/' + str(step), '-i', 'pipe:0']
+        cmd += ['-filter_complex', '[0:v]' + ','.join(filters + ['palettegen']), 'palette.png']
+        self.runFfmpegWithProgress(cmd, 0, frameData)
+
+    def getInterpolationFilter(self, preset):
+        return 'minterpolate=fps=' + str(preset.INTERPOLATE_FRAMERATE) + \
+               ':mi_mode=' + preset.INTERPOLATE_MODE + \
+               ':me_mode=' + preset.INTERPOLATE_ESTIMATION + \
+               ':mc_mode=' + preset.INTERPOLATE_COMPENSATION + \
+               ':me=' + preset.INTERPOLATE_ALGORITHM
+
+    def interpolate(self, preset):
+        if not preset.INTERPOLATE:
             return
 
-        if self.METADATA is None:
-            self.PARENT.sendClientPopup('warning', 'No Timecode Data', 'The Frame Collection doesn\'t contain any Metadata. Timecode Genreation will be skipped.')
+        self.setState(RenderJobState.INTERPOLATING)
+
+        numWindows = self.getNumInterpolationWindows(preset)
+        if numWindows > 1:
+            self.interpolateWindowed(preset, numWindows)
             return
 
-        self.setState(RenderJobState.ADDING_TIMECODES)
-        timecodeRenderer = TimecodeRenderer(self._basefolder)
+        numFrames = preset.getNumInterpolatedFrames(len(self.getProcessedFrameNames(preset)))
+        cmd = ['-framerate', str(preset.FRAMERATE), '-i', self.FRAME_STORE.getPattern('P_'), '-r', str(preset.INTERPOLATE_FRAMERATE)]
+        cmd += ['-vf', self.getInterpolationFilter(preset), '-frames:v', str(numFrames)]
+
+        cmd += self.FRAME_STORE.getFfmpegOutputArgs()
+        cmd += [self.FRAME_STORE.getPattern('F_')]
+        self.runFfmpegWithProgress(cmd, numFrames)
+
+    def getInterpolationWindowStep(self, preset):
+        # Window borders have to fall on a source frame that also has an interpolated frame at exactly the same time
+        return preset.FRAMERATE // gcd(preset.FRAMERATE, preset.INTERPOLATE_FRAMERATE)
+
+    def getNumInterpolationWindows(self, preset):
+        if not self._settings.get(["renderParallelInterpolation"]) or not self._settings.get(["renderMultithreading"]):
+            return 1
+
+        numFrames = len(self.getProcessedFrameNames(preset))
+        maxWindows = numFrames // max(self.INTERPOLATE_WINDOW_MIN_FRAMES, self.getInterpolationWindowStep(preset))
+        numWorkers = self.getAllowedWorkers(CpuHelper.getAvailableCpuCount())
+        return max(1, min(numWorkers, maxWindows))
+
+    def interpolateWindowed(self, preset, numWindows):
+        # FFmpeg's minterpolate only uses a single core, so the frames are split into windows which are interpolated in parallel.
+        # Every window also reads a few frames around it, so the motion estimation at its borders sees the frames a single pass would.
+        # Only the interpolated frames between its borders are kept, they are written right to their final position in the sequence.
+        numFrames = len(self.getProcessedFrameNames(preset))
+        totalFrames = preset.getNumInterpolatedFrames(numFrames)
+        ratio = preset.INTERPOLATE_FRAMERATE / preset.FRAMERATE
+        step = self.getInterpolationWindowStep(preset)
+        windowSize = ceil(ceil(numFrames / numWindows) / step) * step
+        overlap = ceil(self.INTERPOLATE_WINDOW_OVERLAP / step) * step
+
+        runs = []
+        for windowStart in range(0, numFrames, windowSize):
+            windowEnd = min(numFrames, windowStart + windowSize)
+            readStart = max(0, windowStart - overlap)
+            readEnd = min(numFrames, windowEnd + overlap)
+            isLast = windowEnd == numFrames
+
+            # Window borders are multiples of the step, so their interpolated positions are whole frames
+            outputStart = round(windowStart * ratio)
+            outputEnd = totalFrames if isLast else round(windowEnd * ratio)
+            keepStart = outputStart - round(readStart * ratio)
+            filters = [self.getInterpolationFilter(preset), 'trim=start_frame=' + str(keepStart), 'setpts=PTS-STARTPTS']
+
+            # The image sequence demuxer has no end number, so the input is limited by its duration
+            cmd = ['-framerate', str(preset.FRAMERATE), '-start_number', str(readStart + 1), '-t', str((readEnd - readStart) / preset.FRAMERATE)]
+            cmd += ['-i', self.FRAME_STORE.getPattern('P_')]
+            cmd += ['-r', str(preset.INTERPOLATE_FRAMERATE), '-vf', ','.join(filters), '-frames:v', str(outputEnd - outputStart)]
+            cmd += self.FRAME_STORE.getFfmpegOutputArgs()
+            cmd += ['-start_number', str(outputStart + 1), self.FRAME_STORE.getPattern('F_')]
+
+            runs.append((cmd, outputEnd - outputStart, None))
+
+        self.runFfmpegParallel(runs, totalFrames)
+
+    def getProcessedFrameNames(self, preset):
+        chunkSize = preset.COMBINE_SIZE if preset.COMBINE else 1
+        numChunks = len(ListHelper.chunkList(self.FRAMES, chunkSize))
+        return [self.FRAME_STORE.getFileName("P_{:05d}".format(i)) for i in ListHelper.rangeList(numChunks)]
+
+    def getPPRollFrameNames(self, prefix, numFrames):
+        return [self.FRAME_STORE.getFileName(prefix + "{:05d}".format(i)) for i in ListHelper.rangeList(numFrames)]
+
+    def getAllFinalFrames(self, preset):
+        # Only the number of interpolated frames is decided by FFmpeg, all other names are known up front
+        if preset.INTERPOLATE:
+            framesMain = [os.path.basename(f) for f in self.FRAME_STORE.listFiles('F_')]
+        else:
+            framesMain = self.getProcessedFrameNames(preset)
+
+        framesPPPre = self.getPPRollFrameNames('PPROLL_PRE_', preset.getNumPPRollFramesPre())
+        framesPPPost = self.getPPRollFrameNames('PPROLL_POST_', preset.getNumPPRollFramesPost())
+        return framesPPPre + framesMain + framesPPPost
+
+    def getFadeFilters(self, preset, numFrames):
+        fadeInFrames, fadeOutFrames = self.getFadeFrameCounts(preset, numFrames)
+        return FiltergraphBuilder.buildFadeFilters(preset.FADE_COLOR, numFrames, fadeInFrames, fadeOutFrames)
+
+    def getFadeArgs(self, preset, numFrames):
+        fadeFilters = self.getFadeFilters(preset, numFrames)
+        if len(fadeFilters) == 0:
+            return []
+        return ['-vf', ','.join(fadeFilters)]
+
+    def getPaletteArgs(self, preset, numFrames):
+        fadeFilters = self.getFadeFilters(preset, numFrames)
+        source = '[0:v]'
+        graph = []
+        if len(fadeFilters):
+            graph.append(source + ','.join(fadeFilters) + '[faded]')
+            source = '[faded]'
+
+        if self.canCreatePaletteWhileEncoding():
+            graph.append(source + 'split[frames][palette]')
+            graph.append('[palette]palettegen[p]')
+            graph.append('[frames][p]paletteuse')
+            return ['-filter_complex', ';'.join(graph)]
+
+        graph.append(source + '[1:v]paletteuse')
+        return ['-i', 'palette.png', '-filter_complex', ';'.join(graph)]
+
+    def prepareEncodeFrames(self, preset):
+        # The frames are encoded in this order straight from where they were rendered, nothing is renamed
+        self.ENCODE_FRAMES = self.getAllFinalFrames(preset)
+
+    def readEncodeFrames(self, frames):
+        for f in frames:
+            with open(self.FOLDER + '/' + f, 'rb') as frameFile:
+                data = frameFile.read()
+            StageUsage.countRead(len(data))
+            yield data
+
+    def getVideoFile(self):
+        # Previews are only watched once, so they are kept apart from the rendered videos until the Cleanup Controller removes them
+        if self.isPreview():
+            os.makedirs(self.PREVIEW_FOLDER, exist_ok=True)
+            return self.PREVIEW_FOLDER + '/' + self.ID + '.' + self.VIDEO_FORMAT.EXTENSION
 
-        frameFiles = sorted(glob.glob(self.FOLDER + '/[!PPROLL]*.jpg'))
+        timePart = datetime.now().strftime("%Y%m%d%H%M%S")
+        return self._settings.getBaseFolder('timelapse') + '/' + self.BASE_NAME + '_' + timePart + '.' + self.VIDEO_FORMAT.EXTENSION
 
-        jobs = [(frame, timecodeRenderer, preset) for frame in frameFiles]
-        JobExecutor(self._settings, jobs, self.addTimecodesInner, self.setProgress).start()
+    def encode(self, preset):
+        self.setState(RenderJobState.ENCODING)
 
-    def addTimecodesInner(self, j):
-        frame, timecodeRenderer, preset = j
-        frameInfo = FrameTimecodeInfo(self.METADATA['timestamps'][os.path.basename(frame)], self.METADATA['started'], self.METADATA['ended'])
-        img = Image.open(frame)
-        imgRes = timecodeRenderer.applyTimecode(img, preset, frameInfo)
-        imgRes.save(frame, quality=100, subsampling=0)
+        videoFile = self.getVideoFile()
+        outFileName = 'out.' + self.VIDEO_FORMAT.EXTENSION
 
-        img.close()
-        imgRes.close()
+        numSegments = self.getNumEncodeSegments(preset)
+        if numSegments > 1:
+            self.encodeSegmented(preset, outFileName, numSegments)
+        else:
+            cmd = self.FRAME_STORE.getFfmpegInputArgs()
+            cmd += ['-framerate', str(preset.getFinalFramerate()), '-i', 'pipe:0', '-r', str(preset.getFinalFramerate())]
+            if self.VIDEO_FORMAT.CREATE_PALETTE:
+                cmd += self.getPaletteArgs(preset, len(self.ENCODE_FRAMES))
+            else:
+                cmd += self.getFadeArgs(preset, len(self.ENCODE_FRAMES))
+            cmd += self.VIDEO_FORMAT.getRenderArgs()
+            cmd += [outFileName]
 
-    def createPPRoll(self, preset):
-        if not preset.PPROLL:
-            return
+            self.runFfmpegWithProgress(cmd, len(self.ENCODE_FRAMES), self.readEncodeFrames(self.ENCODE_FRAMES))
 
-        self.setState(RenderJobState.GENERATING_PPROLL)
-        frameFiles = sorted(glob.glob(self.FOLDER + '/*.jpg'))
-        numFramesPre = preset.getNumPPRollFramesPre()
-        numFramesPost = preset.getNumPPRollFramesPost()
+        shutil.move(self.FOLDER + '/' + outFileName, videoFile)
+        thumbImg = Image.open(self.FOLDER + '/' + self.ENCODE_FRAMES[int(len(self.ENCODE_FRAMES) / 1.5)])
+        thumbImg.convert('RGB').save(videoFile + '.thumb.jpg', quality=75)
+
+    def getSegmentGopSize(self, preset):
+        return max(1, int(preset.getFinalFramerate() * self.SEGMENT_GOP_SECONDS))
+
+    def getNumEncodeSegments(self, preset):
+        numSegments = int(self._settings.get(["renderEncodeSegments"]) or 1)
+
+        # Segments of a GIF would each get their own palette
+        if numSegments <= 1 or self.VIDEO_FORMAT.CREATE_PALETTE:
+            return 1
+
+        maxSegments = len(self.ENCODE_FRAMES) // self.getSegmentGopSize(preset)
+        return max(1, min(numSegments, maxSegments))
+
+    def encodeSegmented(self, preset, outFileName, numSegments):
+        numFrames = len(self.ENCODE_FRAMES)
+        framerate = preset.getFinalFramerate()
+        gopSize = self.getSegmentGopSize(preset)
+        fadeInFrames, fadeOutFrames = self.getFadeFrameCounts(preset, numFrames)
+
+        # Every segment is a whole number of GOPs, so joining them keeps the keyframe interval intact
+        segmentSize = ceil(ceil(numFrames / numSegments) / gopSize) * gopSize
+        segments = []
+        for i, startFrame in enumerate(range(0, numFrames, segmentSize)):
+            segmentFile = 'segment_{:03d}.'.format(i) + self.VIDEO_FORMAT.EXTENSION
+            segments.append((segmentFile, startFrame, self.ENCODE_FRAMES[startFrame:startFrame + segmentSize]))
+
+        runs = []
+        for segmentFile, startFrame, frames in segments:
+            cmd = self.FRAME_STORE.getFfmpegInputArgs()
+            cmd += ['-framerate', str(framerate), '-i', 'pipe:0', '-r', str(framerate)]
+            fadeFilters = FiltergraphBuilder.buildSegmentFadeFilters(preset.FADE_COLOR, framerate, numFrames, fadeInFrames, fadeOutFrames, startFrame)
+            if len(fadeFilters):
+                cmd += ['-vf', ','.join(fadeFilters)]
+            cmd += self.VIDEO_FORMAT.getRenderArgs()
+            cmd += ['-g', str(gopSize), segmentFile]
+            runs.append((cmd, len(frames), self.readEncodeFrames(frames)))
+
+        self.runFfmpegParallel(runs, numFrames)
+
+        with open(self.FOLDER + '/segments.ffconcat', 'w') as f:
+            f.write('ffconcat version 1.0\n')
+            for segmentFile, startFrame, frames in segments:
+                f.write('file ' + segmentFile + '\n')
+
+        cmd = ['-f', 'concat', '-i', 'segments.ffconcat', '-c', 'copy']
+        cmd += self.VIDEO_FORMAT.getMuxerArgs()
+        cmd += [outFileName]
+        self.runFfmpegWithProgress(cmd)
 
-        jobs = []
-        for i in ListHelper.rangeList(numFramesPre):
-            thisRatio = i / numFramesPre
-            thisOutFile = self.FOLDER + '/' + "PPROLL_PRE_{:05d}".format(i) + ".jpg"
-            jobs.append((thisRatio, frameFiles, thisOutFile, preset, PPRollPhase.PRE))
+        for segmentFile, startFrame, frames in segments:
+            os.remove(self.FOLDER + '/' + segmentFile)
 
-        for i in ListHelper.rangeList(numFramesPost):
-            thisRatio = i / numFramesPost
-            thisOutFile = self.FOLDER + '/' + "PPROLL_POST_{:05d}".format(i) + ".jpg"
-            jobs.append((thisRatio, frameFiles, thisOutFile, preset, PPRollPhase.POST))
+    def canStreamFrames(self):
+        if not self._settings.get(["renderStreamFrames"]):
+            return False
 
-        JobExecutor(self._settings, jobs, self.createPPRollInner, self.setProgress).start()
+        # Interpolation and palette generation need all the frames on disk before encoding
+        return not self.RENDER_PRESET.INTERPOLATE and not self.VIDEO_FORMAT.CREATE_PALETTE
 
-    def createPPRollInner(self, j):
-        thisRatio, frameFiles, thisOutFile, preset, phase = j
-        img = PPRollRenderer.renderFrame(thisRatio, frameFiles, preset, phase, self.METADATA, self._basefolder)
-        img.save(thisOutFile, quality=100, subsampling=0)
-        img.close()
+    def canUseFiltergraph(self):
+        if not self._settings.get(["renderFfmpegFiltergraph"]):
+            return False
 
-    def generateFade(self, preset):
-        if not preset.FADE:
-            return
+        # FFmpeg decodes the JPEGs at full size, previews are faster with draft decoding
+        if self.isPreview():
+            return False
 
-        self.setState(RenderJobState.APPLYING_FADE)
-        frameFiles = self.getAllFinalFrames()
-
-        fadeJobs = []
-        fadeInFrameCount = int(preset.FADE_IN_DURATION / 1000 * preset.getFinalFramerate())
-        fadeOutFrameCount = int(preset.FADE_OUT_DURATION / 1000 * preset.getFinalFramerate())
-
-        if fadeInFrameCount > 0:
-            fadeInElements = frameFiles[0:fadeInFrameCount]
-            for i, element in enumerate(fadeInElements):
-                r = 1 - i / len(fadeInElements)
-                fadeJobs.append((r, element, preset.FADE_COLOR))
-
-        if fadeOutFrameCount > 0:
-            fadeOutElements = frameFiles[-fadeOutFrameCount:]
-            for i, element in enumerate(fadeOutElements):
-                r = (i + 1) / len(fadeOutElements)
-                fadeJobs.append((r, element, preset.FADE_COLOR))
-
-        JobExecutor(self._settings, fadeJobs, self.generateFadeInner, self.setProgress).start()
-
-    def generateFadeInner(self, j):
-        r, imgFile, fadeColor = j
-        col = ColorHelper.hexToRgba(fadeColor, r)
-        img = Image.open(imgFile).convert('RGBA')
-        overlay = Image.new("RGBA", img.size, col)
-        img = Image.alpha_composite(img, overlay).convert('RGB')
-        img.save(imgFile, quality=100, subsampling=0)
-        overlay.close()
-        img.close()
+        return FiltergraphBuilder.canCompile(self.ENHANCEMENT_PRESET, self.RENDER_PRESET, self.VIDEO_FORMAT)
 
-    def createPalette(self, format):
-        if not format.CREATE_PALETTE:
-            return
+    def encodeFiltergraph(self, preset):
+        self.setState(RenderJobState.ENCODING)
 
-        self.setState(RenderJobState.CREATE_PALETTE)
+        videoFile = self.getVideoFile()
+        outFileName = 'out.' + self.VIDEO_FORMAT.EXTENSION
 
-        cmd = ['-i', 'E_%05d.jpg', '-filter_complex', '[0:v]palettegen', 'palette.png']
-        self.runFfmpegWithProgress(cmd)
+        # Dropped frames are never piped to FFmpeg, so they aren't even decoded
+        chunkSize = preset.COMBINE_SIZE if preset.COMBINE else 1
+        frames = [chunk[-1] for chunk in ListHelper.chunkList(self.FRAMES, chunkSize)]
+        totalFrames = preset.calculateTotalFrames(self.FRAMEZIP, False)
+        fadeInFrames, fadeOutFrames = self.getFadeFrameCounts(preset, totalFrames)
 
-    def interpolateOrMove(self, preset):
-        if preset.INTERPOLATE:
-            self.setState(RenderJobState.INTERPOLATING)
-
-            framePattern = '%05d.jpg'
-            if preset.COMBINE:
-                framePattern = 'C_%05d.jpg'
-
-            cmd = ['-framerate', str(preset.FRAMERATE), '-i', framePattern, '-r', str(self.RENDER_PRESET.getFinalFramerate())]
-            videoFilters = []
-            if preset.INTERPOLATE:
-                cmd += ['-r', str(preset.INTERPOLATE_FRAMERATE)]
-                miStr = 'minterpolate=fps=' + str(preset.INTERPOLATE_FRAMERATE) + \
-                        ':mi_mode=' + preset.INTERPOLATE_MODE + \
-                        ':me_mode=' + preset.INTERPOLATE_ESTIMATION + \
-                        ':mc_mode=' + preset.INTERPOLATE_COMPENSATION + \
-                        ':me=' + preset.INTERPOLATE_ALGORITHM
-                videoFilters += [miStr]
-            else:
-                cmd += ['-r', str(preset.FRAMERATE)]
+        with self.FRAME_SOURCE.open(frames[0]) as img:
+            frameSize = img.size
 
-            if len(videoFilters):
-                cmd += ['-vf', ','.join(videoFilters)]
+        inputArgs, filterComplex = FiltergraphBuilder.build(self.ENHANCEMENT_PRESET, preset, frameSize, totalFrames, fadeInFrames, fadeOutFrames)
 
-            cmd += ['-qscale:v', '1', 'F_%05d.jpg']
-            self.runFfmpegWithProgress(cmd, preset.calculateTotalFrames(self.FRAMEZIP, False))
-        else:
-            self.setState(RenderJobState.MOVING_FRAMES)
-            frames = sorted(glob.glob(self.FOLDER + '/[!PPROLL]*.jpg'))
-            for i, f in enumerate(frames):
-                fName = "F_{:05d}".format(i + 1) + ".jpg"
-                shutil.move(f, self.FOLDER + '/' + fName)
-
-    def getAllFinalFrames(self):
-        framesPPPre = sorted(glob.glob(self.FOLDER + '/PPROLL_PRE_*.jpg'))
-        framesPPPost = sorted(glob.glob(self.FOLDER + '/PPROLL_POST_*.jpg'))
-        framesFinal = sorted(glob.glob(self.FOLDER + '/F_*.jpg'))
-        framesAll = framesPPPre + framesFinal + framesPPPost
-        return framesAll
-
-    def moveEncodeFrames(self):
-        self.setState(RenderJobState.MOVING_FRAMES)
-        framesAll = self.getAllFinalFrames()
-
-        for i, f in enumerate(framesAll):
-            eName = "E_{:05d}".format(i + 1) + ".jpg"
-            shutil.move(f, self.FOLDER + '/' + eName)
+        cmd = ['-f', 'image2pipe', '-framerate', str(preset.FRAMERATE), '-c:v', 'mjpeg', '-i', 'pipe:0']
+        cmd += inputArgs
+        cmd += ['-filter_complex', filterComplex, '-map', '[out]', '-r', str(preset.getFinalFramerate())]
+        cmd += self.VIDEO_FORMAT.getRenderArgs()
+        cmd += [outFileName]
 
-    def encode(self, preset):
+        # The JPEGs are passed on exactly as they are stored in the Frame Collection
+        frameData = (self.FRAME_SOURCE.read(f) for f in frames)
+        self.runFfmpegWithProgress(cmd, totalFrames, frameData)
+
+        shutil.move(self.FOLDER + '/' + outFileName, videoFile)
+        thumbImg = self.FRAME_PROCESSOR.renderChunk([frames[int(len(frames) / 1.5)]])
+        thumbImg.convert('RGB').save(videoFile + '.thumb.jpg', quality=75)
+        thumbImg.close()
+
+    def encodeStream(self, preset):
         self.setState(RenderJobState.ENCODING)
 
-        timePart = datetime.now().strftime("%Y%m%d%H%M%S")
-        videoFile = self._settings.getBaseFolder('timelapse') + '/' + self.BASE_NAME + '_' + timePart + '.' + self.VIDEO_FORMAT.EXTENSION
+        videoFile = self.getVideoFile()
         outFileName = 'out.' + self.VIDEO_FORMAT.EXTENSION
+        thumbFile = self.FOLDER + '/thumb.jpg'
+
+        chunkSize = preset.COMBINE_SIZE if preset.COMBINE else 1
+        chunks = ListHelper.chunkList(self.FRAMES, chunkSize)
+        framesPPPre = [self.FOLDER + '/' + f for f in self.getPPRollFrameNames('PPROLL_PRE_', preset.getNumPPRollFramesPre())]
+        framesPPPost = [self.FOLDER + '/' + f for f in self.getPPRollFrameNames('PPROLL_POST_', preset.getNumPPRollFramesPost())]
 
-        cmd = ['-framerate', str(self.RENDER_PRESET.getFinalFramerate()), '-i', 'E_%05d.jpg', '-r', str(self.RENDER_PRESET.getFinalFramerate())]
+        sources = [(f, False) for f in framesPPPre] + [(c, True) for c in chunks] + [(f, False) for f in framesPPPost]
+        thumbIndex = int(len(sources) / 1.5)
+        jobs = [(source, isChunk, thumbFile if i == thumbIndex else None) for i, (source, isChunk) in enumerate(sources)]
+
+        # Streaming is never used for palette formats, so FFmpeg can always apply the fade
+        cmd = ['-f', 'image2pipe', '-framerate', str(preset.getFinalFramerate()), '-c:v', 'ppm', '-i', 'pipe:0', '-r', str(preset.getFinalFramerate())]
+        cmd += self.getFadeArgs(preset, len(sources))
         cmd += self.VIDEO_FORMAT.getRenderArgs()
         cmd += [outFileName]
 
-        self.runFfmpegWithProgress(cmd, preset.calculateTotalFrames(self.FRAMEZIP))
+        frameData = JobExecutor(self._settings, jobs, self.FRAME_PROCESSOR.renderStreamFrame, self.setProgress, False, self.getAllowedWorkers, self.STAGE_USAGE).stream()
+        self.runFfmpegWithProgress(cmd, len(jobs), frameData)
 
         shutil.move(self.FOLDER + '/' + outFileName, videoFile)
-        frameFiles = glob.glob(self.FOLDER + '/E_*.jpg')
-        thumbImg = Image.open(frameFiles[int(len(frameFiles) / 1.5)])
-        thumbImg.save(videoFile + '.thumb.jpg', quality=75)
+        shutil.move(thumbFile, videoFile + '.thumb.jpg')
+
+    def runFfmpegParallel(self, runs, totalFrames):
+        # Runs several FFmpeg processes at once, each given as (params, frames, inputData), and sums up their progress
+        runProgress = [0] * len(runs)
+        progressLock = Lock()
+
+        def run(i):
+            params, numFrames, inputData = runs[i]
+
+            def onProgress(p):
+                with progressLock:
+                    runProgress[i] = min(1, p) * numFrames
+                    progress = sum(runProgress) / totalFrames
+                self.setProgress(progress)
+
+            self.runFfmpegWithProgress(params, numFrames, inputData, onProgress)
+
+        numWorkers = self.getAllowedWorkers(len(runs))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=numWorkers) as executor:
+            for future in [executor.submit(run, i) for i in range(len(runs))]:
+                future.result()
+
+    def writeFfmpegInput(self, process, inputData, inputErrors):
+        # Frames are read and encoded while they are written, so this thread's usage belongs to the stage
+        if self.STAGE_USAGE is not None:
+            self.STAGE_USAGE.runInThread(self.writeFfmpegFrames, process, inputData, inputErrors)
+        else:
+            self.writeFfmpegFrames(process, inputData, inputErrors)
+
+    def writeFfmpegFrames(self, process, inputData, inputErrors):
+        try:
+            for data in inputData:
+                process.stdin.write(data)
+        except BrokenPipeError:
+            # FFmpeg exited early, its return code tells what went wrong
+            pass
+        except Exception as e:
+            inputErrors.append(e)
+            process.kill()
+        finally:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    def throttleFfmpeg(self, process, finished):
+        # FFmpeg stages can run for a long time, so they are throttled while they run and not only when they start
+        throttled = False
+        while not finished.is_set():
+            if self.SCHEDULER.isPaused() and hasattr(signal, 'SIGSTOP'):
+                process.send_signal(signal.SIGSTOP)
+                self.SCHEDULER.setJobPaused(self, True)
+                while self.SCHEDULER.isPaused() and not finished.is_set():
+                    finished.wait(self.SCHEDULER.CHECK_INTERVAL)
+                process.send_signal(signal.SIGCONT)
+                self.SCHEDULER.setJobPaused(self, False)
+            elif self.SCHEDULER.isThrottled() and not throttled:
+                # The niceness of a process can't be lowered again without privileges, so it stays low until FFmpeg exits
+                CpuHelper.setProcessNiceness(process.pid, self.FFMPEG_THROTTLED_NICENESS)
+                throttled = True
+
+            finished.wait(self.SCHEDULER.CHECK_INTERVAL)
+
+    def runFfmpegWithProgress(self, params, totalFrames=0, inputData=None, callbackProgress=None):
+        # While a print is capturing, FFmpeg only uses a single thread for decoding, filtering and encoding
+        if self.isThrottled():
+            params = params[:-1] + ['-threads', '1', '-filter_threads', '1'] + params[-1:]
 
-    def runFfmpegWithProgress(self, params, totalFrames=0):
         Log.debug('Executing FFmpeg', params)
 
         cmd = [self._settings.get(["ffmpegPath"]), '-y']
         cmd += params
         cmd += ['-hide_banner', '-loglevel', 'info', '-progress', 'pipe:1', '-nostats']
-        process = subprocess.Popen(cmd, cwd=self.FOLDER, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
 
+        stdin = subprocess.PIPE if inputData is not None else None
+        process = subprocess.Popen(cmd, cwd=self.FOLDER, stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        CpuHelper.setProcessNiceness(process.pid, self.FFMPEG_NICENESS)
+
+        finished = Event()
+        throttleThread = None
+        if self.SCHEDULER is not None:
+            throttleThread = Thread(target=self.throttleFfmpeg, args=(process, finished), daemon=True)
+            throttleThread.start()
+
+        inputErrors = []
+        inputThread = None
+        if inputData is not None:
+            inputThread = Thread(target=self.writeFfmpegInput, args=(process, inputData, inputErrors), daemon=True)
+            inputThread.start()
+
+        # FFmpeg is only reaped after its output ended, so its resource usage can be read when it is
         outLines = []
-        while process.poll() is None:
-            line = process.stdout.readline().decode()
+        for line in iter(process.stdout.readline, b''):
+            line = line.decode()
             outLines += line.split('\n')
 
             m = re.search('^frame=([0-9]+)', line)
             if m and totalFrames > 0:
                 frame = int(m.groups()[0])
                 p = frame / totalFrames
-                self.setProgress(p)
+                if callbackProgress is not None:
+                    callbackProgress(p)
+                else:
+                    self.setProgress(p)
 
-        outLines += process.stdout.read().decode().split('\n')
         outLines = [x.replace('\r', '').strip() for x in outLines]
         outLines = [x for x in outLines if x != '']
 
+        finished.set()
+        if throttleThread is not None:
+            throttleThread.join()
+
+        self.waitFfmpeg(process)
+
+        if inputThread is not None:
+            inputThread.join()
+
+        if len(inputErrors) > 0:
+            raise inputErrors[0]
+
         if process.returncode != 0:
             for ol in outLines:
                 Log.error(ol)
 
             raise Exception("Failed to run FFmpeg (Return Code " + str(process.returncode) + ")")
 
+    def waitFfmpeg(self, process):
+        # Waiting for this process alone gives FFmpeg's own usage, the usage of all children would include the workers and other Render Jobs
+        if not hasattr(os, 'wait4') or process.returncode is not None:
+            process.wait()
+            return
+
+        try:
+            pid, status, usage = os.wait4(process.pid, 0)
+        except ChildProcessError:
+            # Signalling FFmpeg while it exited may already have reaped it
+            process.wait()
+            return
+
+        process.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+        if self.STAGE_USAGE is not None:
+            self.STAGE_USAGE.addChild(usage)
+
     def startPipeline(self):
         Log.info('Starting Rendering Pipeline', {'id': self.ID})
         Log.debug('Enhancement Preset', self.ENHANCEMENT_PRESET.getJSON())
@@ -456,19 +919,12 @@ class RenderJob:
         Log.debug('Video Format', self.VIDEO_FORMAT.getJSON())
 
         try:
-            self.extractZip()
-            self.normalizeImages(self.ENHANCEMENT_PRESET)
-            self.enhanceImages(self.ENHANCEMENT_PRESET)
-            self.blurImages(self.ENHANCEMENT_PRESET)
-            self.createPPRoll(self.RENDER_PRESET)
-            self.resizeImages(self.RENDER_PRESET)
-            self.combineImages(self.RENDER_PRESET)
-            self.addTimecodes(self.ENHANCEMENT_PRESET)
-            self.interpolateOrMove(self.RENDER_PRESET)
-            self.generateFade(self.RENDER_PRESET)
-            self.moveEncodeFrames()
-            self.createPalette(self.VIDEO_FORMAT)
-            self.encode(self.RENDER_PRESET)
+            self.openFrameZip()
+            self.setupFrameProcessor()
+            self.loadExpectedThroughput()
+
+            for name, fn, arg in self.getStages():
+                self.runStage(name, fn, arg)
 
             self.setState(RenderJobState.FINISHED)
         except Exception as e:
@@ -478,4 +934,7 @@ class RenderJob:
             raise e
         finally:
             self.RUNNING = False
+            self.CURRENT_STAGE = None
+            if self.FRAME_SOURCE is not None:
+                self.FRAME_SOURCE.close()
             shutil.rmtree(self.FOLDER)
@@ -19,3 +19,4 @@ class RenderJobState(Enum):
     INTERPOLATING = 16
     ANALYZING = 17
     NORMALIZING = 18
+    PROCESSING = 19
@@ -58,7 +58,7 @@ class RenderPreset:
             self.setJSON(d)
 
     def applyResize(self, img):
-        if not self.RESIZE:
+        if not self.RESIZE or img.size == (self.RESIZE_W, self.RESIZE_H):
             return img
 
         img = img.resize((self.RESIZE_W, self.RESIZE_H), resample=Image.LANCZOS)
@@ -93,6 +93,9 @@ class RenderPreset:
 
         return ret
 
+    def getNumInterpolatedFrames(self, numFrames):
+        return ceil(numFrames * self.INTERPOLATE_FRAMERATE / self.FRAMERATE)
+
     def calculateTotalFrames(self, frameZip, includePPRoll=True):
         totalFrames = frameZip.FRAMES
 
@@ -100,8 +103,7 @@ class RenderPreset:
             totalFrames = len(ListHelper.chunkList(ListHelper.rangeList(totalFrames), self.COMBINE_SIZE))
 
         if (self.INTERPOLATE):
-            totalFrames *= (self.INTERPOLATE_FRAMERATE / self.FRAMERATE)
-            totalFrames = ceil(totalFrames)
+            totalFrames = self.getNumInterpolatedFrames(totalFrames)
 
         if includePPRoll:
             totalFrames += self.getNumPPRollFramesPre()
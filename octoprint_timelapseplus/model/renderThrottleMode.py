@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class RenderThrottleMode(Enum):
+    NONE = 1
+    REDUCE = 2
+    PAUSE = 3
@@ -0,0 +1,84 @@
+from threading import Condition, Thread
+
+from .log import Log
+from .model.renderThrottleMode import RenderThrottleMode
+
+
+class RenderController:
+    CHECK_INTERVAL = 1.0
+
+    def __init__(self, parent, settings):
+        self.PARENT = parent
+        self._settings = settings
+
+        # Entries are (-priority, sequence, job), so higher priorities start first and equal ones in FIFO order
+        self.QUEUE = []
+        self.RUNNING_JOBS = []
+        self._sequence = 0
+        self._condition = Condition()
+
+        self.THREAD = Thread(target=self.run, daemon=True)
+        self.THREAD.start()
+
+    def enqueue(self, job, priority=0):
+        with self._condition:
+            self._sequence = self._sequence + 1
+            job.SCHEDULER = self
+            self.QUEUE.append((-priority, self._sequence, job))
+            self.QUEUE.sort(key=lambda x: (x[0], x[1]))
+            self._condition.notify_all()
+
+        Log.info('Render Job queued', {'id': job.ID, 'priority': priority, 'queued': len(self.QUEUE)})
+
+    def getThrottleMode(self):
+        return RenderThrottleMode[self._settings.get(["renderThrottleMode"])]
+
+    def isPrintCapturing(self):
+        printJob = self.PARENT.PRINTJOB
+        return printJob is not None and printJob.isCapturing()
+
+    def isThrottled(self):
+        return self.getThrottleMode() != RenderThrottleMode.NONE and self.isPrintCapturing()
+
+    def isPaused(self):
+        return self.getThrottleMode() == RenderThrottleMode.PAUSE and self.isPrintCapturing()
+
+    def getMaxConcurrentJobs(self):
+        if self.isPaused():
+            return 0
+        if self.isThrottled():
+            return 1
+        return max(1, int(self._settings.get(["renderMaxConcurrentJobs"])))
+
+    def run(self):
+        while True:
+            with self._condition:
+                self.startQueuedJobs()
+                self._condition.wait(self.CHECK_INTERVAL)
+
+    def startQueuedJobs(self):
+        self.RUNNING_JOBS = [j for j in self.RUNNING_JOBS if j.RUNNING]
+
+        while len(self.QUEUE) > 0 and len(self.RUNNING_JOBS) < self.getMaxConcurrentJobs():
+            job = self.QUEUE.pop(0)[2]
+            job.start()
+            self.RUNNING_JOBS.append(job)
+
+    def getAllowedWorkers(self, job, numWorkers):
+        # Blocks the calling Render Job while rendering is paused for a capturing print
+        if self.isPaused():
+            self.setJobPaused(job, True)
+            while self.isPaused():
+                with self._condition:
+                    self._condition.wait(self.CHECK_INTERVAL)
+            self.setJobPaused(job, False)
+
+        if self.isThrottled():
+            return 1
+
+        return numWorkers
+
+    def setJobPaused(self, job, paused):
+        job.PAUSED = paused
+        Log.info('Render Job ' + ('paused' if paused else 'resumed'), {'id': job.ID})
+        self.PARENT.sendClientData()
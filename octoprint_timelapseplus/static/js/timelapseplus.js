@@ -46,6 +46,8 @@ $(function() {
 
         self.hasVideoPlaybackError = ko.observable(false);
         self.videoPreviewIsGif = ko.observable(false);
+        self.requestedRenderPreviews = {};
+        self.finishedRenderPreviews = {};
 
         self.snapshotCommand = ko.observable();
         self.captureMode = ko.observable();
@@ -361,7 +363,7 @@ $(function() {
             // https://fontawesome.com/v5/cheatsheet
             let stateVms = {
                 "WAITING": {title: "Waiting", showProgress: false, icon: "fas fa-hourglass-half"},
-                "EXTRACTING": {title: "Extracting Frame Collection", showProgress: false, icon: "fas fa-box-open"},
+                "EXTRACTING": {title: "Opening Frame Collection", showProgress: false, icon: "fas fa-box-open"},
                 "FINISHED": {title: "Finished", showProgress: false, icon: "fas fa-check"},
                 "FAILED": {title: "Failed", showProgress: false, icon: "fas fa-exclamation-triangle"},
                 "ENHANCING": {title: "Enhancing Images", showProgress: true, icon: "fas fa-magic"},
@@ -376,9 +378,13 @@ $(function() {
                 "MOVING_FRAMES": {title: "Moving Frames", showProgress: false, icon: "fas fa-copy"},
                 "INTERPOLATING": {title: "Interpolating Frames", showProgress: true, icon: "fas fa-object-group"},
                 "ANALYZING": {title: "Analyzing Lighting", showProgress: true, icon: "fas fa-search"},
-                "NORMALIZING": {title: "Normalizing Lighting", showProgress: true, icon: "fas fa-wave-square"}
+                "NORMALIZING": {title: "Normalizing Lighting", showProgress: true, icon: "fas fa-wave-square"},
+                "PROCESSING": {title: "Processing Frames", showProgress: true, icon: "fas fa-cogs"}
             };
 
+            if (job.paused)
+                return {title: "Paused while Printing", showProgress: false, icon: "fas fa-pause"};
+
             if (job.state in stateVms)
                 return stateVms[job.state];
 
@@ -504,6 +510,31 @@ $(function() {
             $("div#tlp-modal-render").modal("hide");
         };
 
+        self.startRenderPreview = function() {
+            self.api("renderPreview", {
+                frameZipId: self.selectedFrameZip().id,
+                presetEnhancement: self.selectedPresetEnhancement(),
+                presetRender: self.selectedPresetRender()
+            }, function(data) {
+                if (data == null || !("id" in data))
+                    return;
+
+                // A short preview can finish before this response arrives
+                if (data.id in self.finishedRenderPreviews) {
+                    self.openRenderPreview(data.id, self.finishedRenderPreviews[data.id]);
+                    return;
+                }
+                self.requestedRenderPreviews[data.id] = true;
+            });
+            $("div#tlp-modal-render").modal("hide");
+        };
+
+        self.openRenderPreview = function(id, url) {
+            delete self.requestedRenderPreviews[id];
+            delete self.finishedRenderPreviews[id];
+            self.openVideo({extension: "mp4", url: url});
+        };
+
         self.editQuickSettingsEnabled = function() {
             let newVal = !self.config().enabled;
             self.editQuickSettings({enabled: newVal}, function(cfg) {
@@ -581,6 +612,15 @@ $(function() {
                 return;
             }
 
+            if ("type" in data && data.type == "preview") {
+                // Every client gets this message, only the one that started the preview opens it
+                if (data.id in self.requestedRenderPreviews)
+                    self.openRenderPreview(data.id, data.url);
+                else
+                    self.finishedRenderPreviews[data.id] = data.url;
+                return;
+            }
+
             if ("allWebcams" in data)
                 self.allWebcams(data.allWebcams);
 
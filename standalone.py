@@ -0,0 +1,16 @@
+import os
+import sys
+import types
+
+PLUGIN_PACKAGE = 'octoprint_timelapseplus'
+
+
+def registerPluginPackage():
+    # The package's __init__ is the OctoPrint plugin entry point, which needs OctoPrint installed.
+    # The rendering pipeline below it doesn't, so the tests and benchmarks register the package without running its __init__.
+    if PLUGIN_PACKAGE in sys.modules:
+        return
+
+    package = types.ModuleType(PLUGIN_PACKAGE)
+    package.__path__ = [os.path.join(os.path.dirname(os.path.abspath(__file__)), PLUGIN_PACKAGE)]
+    sys.modules[PLUGIN_PACKAGE] = package
@@ -0,0 +1,108 @@
+import unittest
+from types import SimpleNamespace
+
+from octoprint_timelapseplus.helpers.filtergraphBuilder import FiltergraphBuilder
+from octoprint_timelapseplus.helpers.formatHelper import FormatHelper
+from octoprint_timelapseplus.model.combineMethod import CombineMethod
+from octoprint_timelapseplus.model.enhancementPreset import EnhancementPreset
+from octoprint_timelapseplus.model.renderPreset import RenderPreset
+
+
+class FiltergraphBuilderTest(unittest.TestCase):
+    def setUp(self):
+        self.EP = EnhancementPreset(None)
+        self.RP = RenderPreset()
+        self.FORMAT = FormatHelper.getVideoFormatById('mp4-h264-hq')
+        self.MASK = SimpleNamespace(PATH='/tmp/mask.png')
+
+    def canCompile(self):
+        return FiltergraphBuilder.canCompile(self.EP, self.RP, self.FORMAT)
+
+    def testCanCompileDefaults(self):
+        self.assertTrue(self.canCompile())
+
+    def testCanCompileSupportedOptions(self):
+        self.EP.ENHANCE = True
+        self.EP.BRIGHTNESS = 1.2
+        self.EP.BLUR = True
+        self.EP.BLUR_MASK = self.MASK
+        self.RP.RESIZE = True
+        self.RP.FADE = True
+        self.RP.COMBINE = True
+        self.RP.COMBINE_METHOD = CombineMethod.DROP
+        self.assertTrue(self.canCompile())
+
+    def testCanCompileRejectsUnsupportedOptions(self):
+        cases = [
+            ('NORMALIZE', lambda: setattr(self.EP, 'NORMALIZE', True)),
+            ('DEFLICKER', lambda: setattr(self.EP, 'DEFLICKER', True)),
+            ('EQUALIZE', lambda: (setattr(self.EP, 'ENHANCE', True), setattr(self.EP, 'EQUALIZE', True))),
+            ('CONTRAST', lambda: (setattr(self.EP, 'ENHANCE', True), setattr(self.EP, 'CONTRAST', 1.1))),
+            ('BLUR without mask', lambda: setattr(self.EP, 'BLUR', True)),
+            ('TIMECODE', lambda: setattr(self.EP, 'TIMECODE', True)),
+            ('COMBINE', lambda: (setattr(self.RP, 'COMBINE', True), setattr(self.RP, 'COMBINE_METHOD', CombineMethod.MEDIAN))),
+            ('PPROLL', lambda: setattr(self.RP, 'PPROLL', True)),
+            ('INTERPOLATE', lambda: setattr(self.RP, 'INTERPOLATE', True)),
+            ('palette', lambda: setattr(self, 'FORMAT', FormatHelper.getVideoFormatById('gif')))
+        ]
+        for name, apply in cases:
+            with self.subTest(name):
+                self.setUp()
+                apply()
+                self.assertFalse(self.canCompile())
+
+    def testCanCompileIgnoresDisabledEnhancements(self):
+        self.EP.EQUALIZE = True
+        self.EP.CONTRAST = 1.5
+        self.assertTrue(self.canCompile())
+
+    def testBuildDefaults(self):
+        inputArgs, graph = FiltergraphBuilder.build(self.EP, self.RP, (640, 480), 100, 0, 0)
+        self.assertEqual(inputArgs, [])
+        self.assertEqual(graph, '[0:v]format=rgb24[out]')
+
+    def testBuildBrightnessResizeAndFades(self):
+        self.EP.ENHANCE = True
+        self.EP.BRIGHTNESS = 1.5
+        self.RP.RESIZE = True
+        self.RP.RESIZE_W = 320
+        self.RP.RESIZE_H = 240
+        self.RP.FADE_COLOR = 'Black'
+
+        inputArgs, graph = FiltergraphBuilder.build(self.EP, self.RP, (640, 480), 100, 10, 20)
+        self.assertEqual(inputArgs, [])
+        self.assertEqual(graph, '[0:v]format=rgb24,lutrgb=r=val*1.5:g=val*1.5:b=val*1.5,scale=320:240:flags=lanczos,'
+                                'fade=t=in:s=0:n=10:c=Black,fade=t=out:s=80:n=20:c=Black[out]')
+
+    def testBuildBlur(self):
+        self.EP.BLUR = True
+        self.EP.BLUR_RADIUS = 30
+        self.EP.BLUR_MASK = self.MASK
+
+        inputArgs, graph = FiltergraphBuilder.build(self.EP, self.RP, (640, 480), 100, 0, 0)
+        self.assertEqual(inputArgs, ['-i', self.MASK.PATH])
+        self.assertEqual(graph.split(';'), [
+            '[0:v]format=rgb24,split[base][toblur]',
+            '[toblur]gblur=sigma=30[blurred]',
+            '[1:v]format=gray,scale=640:480:flags=lanczos[mask]',
+            '[blurred][mask]alphamerge[masked]',
+            '[base][masked]overlay=format=rgb[out]'
+        ])
+
+    def testBuildFadeFilters(self):
+        self.assertEqual(FiltergraphBuilder.buildFadeFilters('White', 50, 0, 0), [])
+        self.assertEqual(FiltergraphBuilder.buildFadeFilters('White', 50, 5, 0), ['fade=t=in:s=0:n=5:c=White'])
+        self.assertEqual(FiltergraphBuilder.buildFadeFilters('White', 50, 0, 5), ['fade=t=out:s=45:n=5:c=White'])
+
+    def testBuildSegmentFadeFilters(self):
+        self.assertEqual(FiltergraphBuilder.buildSegmentFadeFilters('Black', 25, 100, 0, 0, 40), [])
+        self.assertEqual(FiltergraphBuilder.buildSegmentFadeFilters('Black', 25, 100, 25, 50, 40), [
+            'setpts=PTS+40/(25*TB)',
+            'fade=t=in:st=0:d=1.0:c=Black',
+            'fade=t=out:st=2.0:d=2.0:c=Black',
+            'setpts=PTS-STARTPTS'
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
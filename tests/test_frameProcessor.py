@@ -0,0 +1,90 @@
+import io
+import unittest
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageEnhance
+
+from octoprint_timelapseplus.helpers.frameProcessor import FrameProcessor
+from octoprint_timelapseplus.model.enhancementPreset import EnhancementPreset
+from octoprint_timelapseplus.model.renderPreset import RenderPreset
+
+
+class MemoryFrameSource:
+    def __init__(self, frames):
+        self.FRAMES = frames
+
+    def open(self, frame):
+        return Image.open(io.BytesIO(self.FRAMES[frame]))
+
+
+class FrameProcessorAnalysisTest(unittest.TestCase):
+    # Brightness ranges of the test frames, normalizing them never pushes a pixel into the clipped highlights
+    FRAME_RANGES = [(50, 120), (70, 150), (90, 140), (60, 170)]
+
+    def setUp(self):
+        rnd = np.random.default_rng(0)
+        frames = {}
+        for i, (low, high) in enumerate(self.FRAME_RANGES):
+            y, x = np.mgrid[0:720, 0:1280]
+            gradient = low + (high - low) * (x / 1280 * 0.6 + y / 720 * 0.4)
+            pixels = np.clip(gradient[..., None] + rnd.normal(0, 4, (720, 1280, 3)), low, high).astype(np.uint8)
+
+            img = Image.fromarray(pixels, 'RGB')
+            draw = ImageDraw.Draw(img)
+            for k in range(30):
+                cx, cy, r = int(rnd.integers(0, 1280)), int(rnd.integers(0, 720)), int(rnd.integers(5, 80))
+                draw.ellipse((cx - r, cy - r, cx + r, cy + r), fill=tuple(int(v) for v in rnd.integers(low, high, 3)))
+
+            buffer = io.BytesIO()
+            img.save(buffer, format='JPEG', quality=90)
+            frames['frame_{:04d}.jpg'.format(i)] = buffer.getvalue()
+
+        self.FRAME_SOURCE = MemoryFrameSource(frames)
+        self.EP = EnhancementPreset(None)
+        self.PROCESSOR = FrameProcessor(None, self.FRAME_SOURCE, None, self.EP, RenderPreset(), None)
+
+    @staticmethod
+    def analyzeFullResolution(img):
+        pixels = np.asarray(img.convert('L'), dtype=np.float64)
+        return pixels.mean(), pixels.std()
+
+    def testDraftAnalysisMatchesFullResolution(self):
+        for frame in self.FRAME_SOURCE.FRAMES:
+            with self.subTest(frame=frame):
+                brightness, contrast = self.PROCESSOR.analyzeFrame(frame)
+                with self.FRAME_SOURCE.open(frame) as img:
+                    expectedBrightness, expectedContrast = self.analyzeFullResolution(img)
+
+                self.assertAlmostEqual(brightness, expectedBrightness, delta=0.5)
+                self.assertAlmostEqual(contrast, expectedContrast, delta=expectedContrast * 0.05)
+
+    def testDraftAnalysisDecodesReducedSize(self):
+        with self.FRAME_SOURCE.open('frame_0000.jpg') as img:
+            img.draft('L', (img.width // FrameProcessor.ANALYSIS_DRAFT_SCALE, img.height // FrameProcessor.ANALYSIS_DRAFT_SCALE))
+            self.assertEqual(img.size, (1280 // FrameProcessor.ANALYSIS_DRAFT_SCALE, 720 // FrameProcessor.ANALYSIS_DRAFT_SCALE))
+            self.assertEqual(img.mode, 'L')
+
+    def testBrightnessScalesContrast(self):
+        # Normalizing derives the contrast of the brightened frame from the analysis instead of analyzing it again
+        with self.FRAME_SOURCE.open('frame_0000.jpg') as img:
+            brightness, contrast = self.analyzeFullResolution(img)
+            for factor in [0.7, 1.3]:
+                with self.subTest(factor=factor), ImageEnhance.Brightness(img).enhance(factor) as imgBrightened:
+                    brightenedBrightness, brightenedContrast = self.analyzeFullResolution(imgBrightened)
+                    self.assertAlmostEqual(brightenedBrightness, brightness * factor, delta=brightness * factor * 0.01)
+                    self.assertAlmostEqual(brightenedContrast, contrast * factor, delta=contrast * factor * 0.02)
+
+    def testNormalizeReachesTarget(self):
+        self.EP.NORMALIZE = True
+        self.PROCESSOR.setup(False)
+        self.PROCESSOR.setAnalyzedValues({f: self.PROCESSOR.analyzeFrame(f) for f in self.FRAME_SOURCE.FRAMES})
+
+        for frame in self.FRAME_SOURCE.FRAMES:
+            with self.subTest(frame=frame), self.PROCESSOR.loadFrame(frame) as img:
+                brightness, contrast = self.analyzeFullResolution(img)
+                self.assertAlmostEqual(brightness, self.PROCESSOR.TARGET_BRIGHTNESS, delta=self.PROCESSOR.TARGET_BRIGHTNESS * 0.02)
+                self.assertAlmostEqual(contrast, self.PROCESSOR.TARGET_CONTRAST, delta=self.PROCESSOR.TARGET_CONTRAST * 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
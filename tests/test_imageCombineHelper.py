@@ -0,0 +1,91 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+from octoprint_timelapseplus.helpers.imageCombineHelper import ImageCombineHelper
+from octoprint_timelapseplus.model.combineMethod import CombineMethod
+
+
+class ImageCombineHelperTest(unittest.TestCase):
+    def setUp(self):
+        self.RANDOM = np.random.default_rng(0)
+
+    def createFrames(self, count, width=7, height=5):
+        return [self.RANDOM.integers(0, 256, (height, width, 3), dtype=np.uint8) for i in range(count)]
+
+    @staticmethod
+    def combine(frames, method):
+        # Frames are passed by index, the helper loads and closes them like files
+        paths = list(range(len(frames)))
+        img = ImageCombineHelper.createCombinedImage(paths, method, lambda p: Image.fromarray(frames[p], 'RGB'))
+        return np.asarray(img)
+
+    def testMedian(self):
+        for count in [2, 3, 4, 5, 8]:
+            with self.subTest(count=count):
+                frames = self.createFrames(count)
+                expected = np.rint(np.median(np.stack(frames), axis=0))
+                np.testing.assert_array_equal(self.combine(frames, CombineMethod.MEDIAN), expected)
+
+    def testMedianRemovesOutlier(self):
+        background = np.full((5, 7, 3), 100, dtype=np.uint8)
+        head = background.copy()
+        head[1:4, 2:5] = 255
+        result = self.combine([background, head, background], CombineMethod.MEDIAN)
+        np.testing.assert_array_equal(result, background)
+
+    def testMedianLargeStack(self):
+        # Stacks above the sorting network limit are sorted by NumPy
+        frames = self.createFrames(ImageCombineHelper.SORT_NETWORK_MAX_FRAMES + 3)
+        expected = np.rint(np.median(np.stack(frames), axis=0))
+        np.testing.assert_array_equal(self.combine(frames, CombineMethod.MEDIAN), expected)
+
+    def testMedianTiled(self):
+        frames = self.createFrames(5, width=9, height=11)
+        expected = np.rint(np.median(np.stack(frames), axis=0))
+        with mock.patch.object(ImageCombineHelper, 'STACK_TILE_BYTES', 1):
+            np.testing.assert_array_equal(self.combine(frames, CombineMethod.MEDIAN), expected)
+
+    def testTrimmedMean(self):
+        for count in [2, 4, 5, 8]:
+            with self.subTest(count=count):
+                frames = self.createFrames(count)
+                cut = int(count * ImageCombineHelper.TRIMMED_MEAN_CUT)
+                stack = np.sort(np.stack(frames).astype(np.float64), axis=0)
+                expected = np.rint(stack[cut:count - cut].mean(axis=0))
+                np.testing.assert_array_equal(self.combine(frames, CombineMethod.TRIMMED_MEAN), expected)
+
+    def testTrimmedMeanIgnoresExtremes(self):
+        frames = [np.full((5, 7, 3), v, dtype=np.uint8) for v in [0, 90, 110, 255]]
+        np.testing.assert_array_equal(self.combine(frames, CombineMethod.TRIMMED_MEAN), np.full((5, 7, 3), 100))
+
+    def testBlendWeighted(self):
+        frames = self.createFrames(4)
+        decay = ImageCombineHelper.WEIGHTED_DECAY
+        weights = [decay ** (len(frames) - 1 - i) for i in range(len(frames))]
+        expected = sum(w * f.astype(np.float64) for w, f in zip(weights, frames)) / sum(weights)
+        result = self.combine(frames, CombineMethod.BLEND_WEIGHTED)
+        self.assertLessEqual(np.abs(result - expected).max(), 0.5 + 1e-3)
+
+    def testBlendWeightedFavorsLastFrame(self):
+        frames = [np.full((5, 7, 3), 0, dtype=np.uint8), np.full((5, 7, 3), 90, dtype=np.uint8)]
+        np.testing.assert_array_equal(self.combine(frames, CombineMethod.BLEND_WEIGHTED), np.full((5, 7, 3), 60))
+
+    def testSingleFrameIsReturnedUnchanged(self):
+        frames = self.createFrames(1)
+        for method in [CombineMethod.MEDIAN, CombineMethod.TRIMMED_MEAN, CombineMethod.BLEND_WEIGHTED]:
+            with self.subTest(method=method):
+                np.testing.assert_array_equal(self.combine(frames, method), frames[0])
+
+    def testGrayscaleFramesAreConverted(self):
+        frames = [np.full((5, 7), v, dtype=np.uint8) for v in [10, 20, 200]]
+        paths = list(range(len(frames)))
+        img = ImageCombineHelper.createCombinedImage(paths, CombineMethod.MEDIAN, lambda p: Image.fromarray(frames[p], 'L'))
+        self.assertEqual(img.mode, 'RGB')
+        np.testing.assert_array_equal(np.asarray(img), np.full((5, 7, 3), 20))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+from octoprint_timelapseplus.helpers.listHelper import ListHelper
+
+
+class ListHelperTest(unittest.TestCase):
+    @staticmethod
+    def naiveRollingMean(values, windowSize):
+        half = windowSize // 2
+        result = []
+        for i in range(len(values)):
+            window = values[max(0, i - half):i + half + 1]
+            result.append(sum(window) / len(window))
+        return result
+
+    def testRollingMeanMatchesCenteredWindow(self):
+        values = [3, 1, 4, 1, 5, 9, 2, 6, 5, 3, 5, 8, 9, 7]
+        for windowSize in [1, 2, 3, 4, 5, 15, 30]:
+            with self.subTest(windowSize=windowSize):
+                result = list(ListHelper.rollingMean(values, windowSize))
+                for actual, expected in zip(result, self.naiveRollingMean(values, windowSize)):
+                    self.assertAlmostEqual(actual, expected)
+                self.assertEqual(len(result), len(values))
+
+    def testRollingMeanShrinksAtBothEnds(self):
+        self.assertEqual(list(ListHelper.rollingMean([0, 10, 20, 30, 40], 3)), [5, 10, 20, 30, 35])
+
+    def testRollingMeanConsumesGenerator(self):
+        values = (float(i) for i in range(100))
+        result = list(ListHelper.rollingMean(values, 5))
+        self.assertEqual(len(result), 100)
+        self.assertAlmostEqual(result[50], 50)
+
+    def testRollingMeanEmpty(self):
+        self.assertEqual(list(ListHelper.rollingMean([], 5)), [])
+
+    def testRollingMeanSingleValue(self):
+        self.assertEqual(list(ListHelper.rollingMean([7], 5)), [7])
+
+
+if __name__ == '__main__':
+    unittest.main()
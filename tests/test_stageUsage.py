@@ -0,0 +1,90 @@
+import shutil
+import tempfile
+import unittest
+
+from PIL import Image
+
+from octoprint_timelapseplus.helpers.frameStore import FrameStore
+from octoprint_timelapseplus.helpers.jobExecutor import JobExecutor
+from octoprint_timelapseplus.helpers.stageUsage import StageUsage
+from octoprint_timelapseplus.model.intermediateFormat import IntermediateFormat
+
+
+class FakeSettings:
+    def __init__(self, multithreading):
+        self.VALUES = dict(renderMultithreading=multithreading, renderMultiprocessing=False)
+
+    def get(self, path):
+        return self.VALUES[path[0]]
+
+
+def countBytes(j):
+    bytesRead, bytesWritten = j
+    StageUsage.countRead(bytesRead)
+    StageUsage.countWritten(bytesWritten)
+    return bytesRead + bytesWritten
+
+
+def spin(j):
+    total = 0
+    for i in range(j):
+        total += i * i
+    return total
+
+
+class StageUsageTest(unittest.TestCase):
+    def testMeasureThreadOnlyCountsItsOwnBytes(self):
+        StageUsage.countRead(1000)
+        result, (cpuTime, bytesRead, bytesWritten) = StageUsage.measureThread(countBytes, (10, 20))
+        self.assertEqual(result, 30)
+        self.assertEqual((bytesRead, bytesWritten), (10, 20))
+        self.assertGreaterEqual(cpuTime, 0)
+
+    def testMeasureProcessCountsCpuTime(self):
+        result, (cpuTime, bytesRead, bytesWritten) = StageUsage.measureProcess(spin, 2000000)
+        self.assertEqual(result, spin(2000000))
+        self.assertGreater(cpuTime, 0)
+        self.assertEqual((bytesRead, bytesWritten), (0, 0))
+
+    def testExecutorAddsUsageOfEveryJob(self):
+        for multithreading in (False, True):
+            with self.subTest(multithreading=multithreading):
+                usage = StageUsage()
+                jobs = [(i, 2 * i) for i in range(20)]
+                executor = JobExecutor(FakeSettings(multithreading), jobs, countBytes, lambda p: None, stageUsage=usage)
+
+                self.assertEqual(executor.start(), [3 * i for i in range(20)])
+                self.assertEqual(usage.BYTES_READ, sum(range(20)))
+                self.assertEqual(usage.BYTES_WRITTEN, 2 * sum(range(20)))
+
+    def testStreamAddsUsageOfEveryJob(self):
+        usage = StageUsage()
+        jobs = [(i, 0) for i in range(10)]
+        results = list(JobExecutor(FakeSettings(True), jobs, countBytes, lambda p: None, stageUsage=usage).stream())
+        self.assertEqual(results, list(range(10)))
+        self.assertEqual(usage.BYTES_READ, sum(range(10)))
+
+    def testFrameStoreCountsWrittenFiles(self):
+        folder = tempfile.mkdtemp()
+        try:
+            for format in IntermediateFormat:
+                with self.subTest(format=format.name):
+                    store = FrameStore(folder, format)
+                    file = store.getFile('P_00000')
+                    img = Image.new('RGB', (16, 9), (10, 20, 30))
+                    result, (cpuTime, bytesRead, bytesWritten) = StageUsage.measureThread(store.save, img, file)
+
+                    with open(file, 'rb') as f:
+                        self.assertEqual(bytesWritten, len(f.read()))
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    def testStageRecordsWallTimeAndPeakRss(self):
+        usage = StageUsage()
+        usage.start()
+        usage.runInThread(spin, 200000)
+        usage.stop()
+
+        self.assertGreater(usage.WALL_TIME, 0)
+        self.assertGreater(usage.PEAK_RSS, 0)
+        self.assertGreaterEqual(usage.CPU_TIME, 0)
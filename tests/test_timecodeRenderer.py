@@ -0,0 +1,133 @@
+import os
+import pickle
+import unittest
+from unittest import mock
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from octoprint_timelapseplus.helpers.colorHelper import ColorHelper
+from octoprint_timelapseplus.helpers.timecodeRenderer import TimecodeRenderer
+from octoprint_timelapseplus.model.enhancementPreset import EnhancementPreset
+from octoprint_timelapseplus.model.frameTimecodeInfo import FrameTimecodeInfo
+from octoprint_timelapseplus.model.timecodeType import TimecodeType
+
+BASE_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'octoprint_timelapseplus')
+
+
+class TimecodeRendererTest(unittest.TestCase):
+    TEXTS = ['01:23:45', '12h 05m 09s', '87%']
+
+    # Element heights at AA_FACTOR scale, from small timecodes up to 15 % of a 1080p frame
+    SIZES = [81, 162, 324, 486]
+
+    def setUp(self):
+        self.RENDERER = TimecodeRenderer(BASE_FOLDER)
+        self.FG = '#FFFFFF'
+        self.BG = '#000000'
+
+    def renderDirect(self, text, size, cellPositions):
+        # Draws the whole text at AA_FACTOR scale and downscales it once, like every frame did before the atlas
+        r = self.RENDERER
+        fnt = ImageFont.truetype(BASE_FOLDER + '/static/assets/fonts/Inconsolata-Regular.ttf', size)
+        padding = int(size * r.TEXT_PADDING)
+        glyphs, paddingTile = r.getGlyphAtlas(size, self.FG, self.BG)
+
+        # The padding is snapped to whole output pixels in both cases, so only the glyph positions can differ
+        paddingW = paddingTile.width * r.AA_FACTOR
+        height = paddingTile.height * r.AA_FACTOR
+        if cellPositions:
+            cellW = glyphs['0'].width * r.AA_FACTOR
+            width = 2 * paddingW + cellW * len(text)
+        else:
+            width = 2 * paddingW + fnt.getbbox(text, anchor='la')[2]
+
+        img = Image.new('RGBA', (width, height))
+        draw = ImageDraw.Draw(img, 'RGBA')
+        draw.rectangle((0, 0, width, height), fill=ColorHelper.hexToRgba(self.BG, 0.5))
+        if cellPositions:
+            for i, c in enumerate(text):
+                draw.text((paddingW + i * cellW, padding), c, font=fnt, fill=ColorHelper.hexToRgba(self.FG, 0.95), anchor='la')
+        else:
+            draw.text((paddingW, padding), text, font=fnt, fill=ColorHelper.hexToRgba(self.FG, 0.95), anchor='la')
+
+        imgSmall = img.resize((width // r.AA_FACTOR, height // r.AA_FACTOR), resample=Image.LANCZOS)
+        img.close()
+        return imgSmall
+
+    @staticmethod
+    def getDifference(imgA, imgB):
+        width = min(imgA.width, imgB.width)
+        height = min(imgA.height, imgB.height)
+        pixelsA = np.asarray(imgA.crop((0, 0, width, height)), dtype=np.int16)
+        pixelsB = np.asarray(imgB.crop((0, 0, width, height)), dtype=np.int16)
+        return np.abs(pixelsA - pixelsB)
+
+    def testAtlasMatchesDirectRenderOfCells(self):
+        # The downscaled tiles pasted side by side look like the same cells downscaled in one piece
+        for size in self.SIZES:
+            for text in self.TEXTS:
+                with self.subTest(size=size, text=text):
+                    imgAtlas = self.RENDERER.createElementText(text, size, self.FG, self.BG)
+                    imgDirect = self.renderDirect(text, size, True)
+                    self.assertEqual(imgAtlas.size, imgDirect.size)
+
+                    difference = self.getDifference(imgAtlas, imgDirect)
+                    self.assertLess(difference.mean(), 0.2)
+                    self.assertLessEqual(difference.max(), 8)
+
+    def getFontAdvance(self, size):
+        return self.RENDERER.getFont(size).getlength('0') / self.RENDERER.AA_FACTOR
+
+    def testAtlasMatchesDirectRenderOfText(self):
+        # Where the font's advance is a whole number of output pixels, the cells are exactly where the font places the glyphs
+        sizes = [s for s in self.SIZES if self.getFontAdvance(s).is_integer()]
+        self.assertGreater(len(sizes), 0)
+        for size in sizes:
+            for text in self.TEXTS:
+                with self.subTest(size=size, text=text):
+                    imgAtlas = self.RENDERER.createElementText(text, size, self.FG, self.BG)
+                    imgDirect = self.renderDirect(text, size, False)
+                    self.assertLessEqual(abs(imgAtlas.width - imgDirect.width), 1)
+                    self.assertEqual(imgAtlas.height, imgDirect.height)
+                    self.assertLess(self.getDifference(imgAtlas, imgDirect).mean(), 1)
+
+    def testGlyphCellsStayCloseToFontAdvance(self):
+        # Otherwise the advance falls between two output pixels and the cells are rounded up, the text gets slightly wider
+        for elementHeight in range(4, 200, 5):
+            size = elementHeight * self.RENDERER.AA_FACTOR
+            with self.subTest(size=size):
+                glyphs, paddingTile = self.RENDERER.getGlyphAtlas(size, self.FG, self.BG)
+                difference = glyphs['0'].width - self.getFontAdvance(size)
+                self.assertGreaterEqual(difference, 0)
+                self.assertLessEqual(difference, 0.5)
+
+    def testFontAndAtlasAreBuiltOncePerJob(self):
+        preset = EnhancementPreset(None)
+        preset.TIMECODE = True
+        preset.TIMECODE_TYPE = TimecodeType.PRINTTIME_HMS_LETTERS
+        started = 1700000000
+
+        truetype = mock.Mock(wraps=ImageFont.truetype)
+        createGlyphAtlas = mock.Mock(wraps=self.RENDERER.createGlyphAtlas)
+        with mock.patch.object(ImageFont, 'truetype', truetype), mock.patch.object(self.RENDERER, 'createGlyphAtlas', createGlyphAtlas):
+            for i in range(20):
+                frameInfo = FrameTimecodeInfo(started + i * 37, started, started + 20 * 37)
+                with Image.new('RGB', (1280, 720)) as img:
+                    self.RENDERER.applyTimecode(img, preset, frameInfo)
+
+        self.assertEqual(truetype.call_count, 1)
+        self.assertEqual(createGlyphAtlas.call_count, 1)
+
+    def testCachesAreNotSentToWorkers(self):
+        self.RENDERER.createElementText(self.TEXTS[0], 162, self.FG, self.BG)
+        self.assertEqual(len(self.RENDERER._glyphAtlases), 1)
+
+        copy = pickle.loads(pickle.dumps(self.RENDERER))
+        self.assertEqual(copy._fonts, {})
+        self.assertEqual(copy._glyphAtlases, {})
+        self.assertEqual(copy.createElementText(self.TEXTS[0], 162, self.FG, self.BG).size, self.RENDERER.createElementText(self.TEXTS[0], 162, self.FG, self.BG).size)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import io
+import json
+import os
+import pickle
+import shutil
+import struct
+import tempfile
+import unittest
+import zipfile
+
+from PIL import Image
+
+from octoprint_timelapseplus.helpers.fileHelper import FileHelper
+from octoprint_timelapseplus.helpers.zipFrameSource import ZipFrameSource
+
+
+class ZipFrameSourceTest(unittest.TestCase):
+    def setUp(self):
+        self.FOLDER = tempfile.mkdtemp()
+        self.PATH = self.FOLDER + '/frames.zip'
+        self.FRAMES = {}
+        for i in range(3):
+            buffer = io.BytesIO()
+            Image.new('RGB', (8, 6), (i * 100, 50, 200 - i * 50)).save(buffer, format='JPEG')
+            self.FRAMES['frame_' + str(i).zfill(4) + '.jpg'] = buffer.getvalue()
+
+    def tearDown(self):
+        shutil.rmtree(self.FOLDER, ignore_errors=True)
+
+    def writeZip(self, compression, extra=b''):
+        with zipfile.ZipFile(self.PATH, 'w', compression) as zipFile:
+            for name in reversed(sorted(self.FRAMES)):
+                info = zipfile.ZipInfo(name)
+                info.compress_type = compression
+                info.extra = extra
+                zipFile.writestr(info, self.FRAMES[name])
+            zipFile.writestr(FileHelper.METADATA_FILE_NAME, json.dumps([dict(snapshotTime=1)]))
+            zipFile.writestr('sub/frame_9999.jpg', b'ignored')
+
+    def assertFramesReadable(self, source):
+        for name, data in self.FRAMES.items():
+            self.assertEqual(bytes(source.read(name)), data)
+            with source.open(name) as img:
+                self.assertEqual(img.size, (8, 6))
+
+    def testStoredOffsets(self):
+        self.writeZip(zipfile.ZIP_STORED)
+        source = ZipFrameSource(self.PATH)
+
+        self.assertEqual(source.FRAMES, sorted(self.FRAMES))
+        self.assertEqual(source.METADATA, [dict(snapshotTime=1)])
+        self.assertNotIn('sub/frame_9999.jpg', source.STORED_OFFSETS)
+
+        with open(self.PATH, 'rb') as f:
+            archive = f.read()
+        for name, data in self.FRAMES.items():
+            offset, size = source.STORED_OFFSETS[name]
+            self.assertEqual(size, len(data))
+            self.assertEqual(archive[offset:offset + size], data)
+
+        self.assertFramesReadable(source)
+        source.close()
+
+    def testStoredOffsetsSkipLocalExtraField(self):
+        # The data starts after the extra field of the local header
+        self.writeZip(zipfile.ZIP_STORED, extra=struct.pack('<HH', 0xCAFE, 4) + b'\0\0\0\0')
+        source = ZipFrameSource(self.PATH)
+        self.assertFramesReadable(source)
+        source.close()
+
+    def testDeflatedMembersAreReadThroughZip(self):
+        self.writeZip(zipfile.ZIP_DEFLATED)
+        source = ZipFrameSource(self.PATH)
+
+        self.assertEqual(source.FRAMES, sorted(self.FRAMES))
+        for name in self.FRAMES:
+            self.assertNotIn(name, source.STORED_OFFSETS)
+
+        self.assertFramesReadable(source)
+        self.assertIsNone(source._mmap)
+        source.close()
+
+    def testMixedCompression(self):
+        with zipfile.ZipFile(self.PATH, 'w') as zipFile:
+            for i, name in enumerate(sorted(self.FRAMES)):
+                zipFile.writestr(name, self.FRAMES[name], zipfile.ZIP_STORED if i % 2 == 0 else zipfile.ZIP_DEFLATED)
+
+        source = ZipFrameSource(self.PATH)
+        self.assertEqual(sorted(source.STORED_OFFSETS), sorted(self.FRAMES)[::2])
+        self.assertFramesReadable(source)
+        source.close()
+
+    def testPickledSourceReopensArchive(self):
+        self.writeZip(zipfile.ZIP_STORED)
+        source = ZipFrameSource(self.PATH)
+        source.read(source.FRAMES[0])
+
+        copy = pickle.loads(pickle.dumps(source))
+        self.assertIsNone(copy._mmap)
+        self.assertEqual(copy.STORED_OFFSETS, source.STORED_OFFSETS)
+        self.assertFramesReadable(copy)
+
+        copy.close()
+        source.close()
+        self.assertTrue(os.path.isfile(self.PATH))
+
+
+if __name__ == '__main__':
+    unittest.main()